@@ -1,7 +1,9 @@
+import asyncio
 import gradio as gr
 import os
+from contextlib import ExitStack
 from datetime import datetime
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import FileResponse, RedirectResponse
 from pydantic import BaseModel
 import uvicorn
@@ -14,11 +16,19 @@ from extractor import (
     sintetizar_gtts,
     traducir_texto,
     traducir_y_sintetizar_audio,
-    detectar_idioma
+    detectar_idioma,
+    sondear_idioma_audio
 )
+from motores_asr import MOTORES_ASR, MOTOR_ASR_POR_DEFECTO
+from pipeline import ARTEFACTOS, ARTEFACTOS_POR_DEFECTO, procesar
+from trabajos import TrabajoDuplicado, trabajo, cancelar_trabajo, cancelar_trabajos_de_sesion
 
 # --- Modelos de Pydantic para la API ---
-class DownloadRequest(BaseModel):
+class CancelableRequest(BaseModel):
+    # Identificador opcional elegido por el cliente para poder cancelar con /api/jobs/{job_id}/cancel.
+    job_id: str | None = None
+
+class DownloadRequest(CancelableRequest):
     url: str
     start_time: str | None = None
     end_time: str | None = None
@@ -30,20 +40,75 @@ class TranslateTextRequest(BaseModel):
     text: str
     target_language: str = 'es'
 
-class TranscriptionRequest(BaseModel):
+class ExtractAudioRequest(CancelableRequest):
+    file_path: str
+
+class TranscriptionRequest(CancelableRequest):
     file_path: str
     model_size: str = "medium"
     diarize: bool = True
+    asr_backend: str = MOTOR_ASR_POR_DEFECTO
+    beam_size: int | None = None
+    vad: bool = False
+    resumable: bool = True
 
 class SynthesisRequest(BaseModel):
     file_path: str
 
-class AudioRequest(BaseModel):
+class AudioRequest(CancelableRequest):
     file_path: str
 
+class ProcessRequest(CancelableRequest):
+    # URL de YouTube o ruta de un archivo local.
+    source: str
+    start_time: str | None = None
+    end_time: str | None = None
+    target_language: str = 'es'
+    model_size: str = "medium"
+    asr_backend: str = MOTOR_ASR_POR_DEFECTO
+    beam_size: int | None = None
+    vad: bool = False
+    diarize: bool = False
+    # 'video' solo con URLs; 'audio' se guarda como WAV mono a 16 kHz (el audio que se transcribe).
+    artifacts: list[str] = ARTEFACTOS_POR_DEFECTO
+
 # --- Inicialización ---
 crear_carpetas_necesarias()
 
+# --- Concurrencia de la interfaz ---
+# Cada grupo tiene su propia cola para que una transcripción larga no bloquee las tareas ligeras.
+COLA_PESADA = "asr"          # Transcripción, diarización y traducción de audio
+COLA_MEDIA = "descarga"      # Descarga de videos y extracción de audio
+COLA_LIGERA = "ligera"       # Traducción de texto, síntesis, cargas y listados
+LIMITE_COLA_PESADA = 1
+LIMITE_COLA_MEDIA = 2
+LIMITE_COLA_LIGERA = 8
+TAMANO_MAXIMO_COLA = 64
+
+# --- Cancelación de trabajos de la API ---
+INTERVALO_DESCONEXION_SEGUNDOS = 1.0
+
+async def ejecutar_trabajo(http_request, job_id, funcion, *args, **kwargs):
+    """
+    Ejecuta `funcion` en un hilo como trabajo cancelable y la cancela si el cliente se desconecta.
+    Devuelve (job_id, resultado); lanza HTTP 409 si el job_id ya está en uso y HTTP 499 si el trabajo fue cancelado.
+    """
+    with ExitStack() as pila:
+        try:
+            job_id, cancelacion = pila.enter_context(trabajo(job_id))
+        except TrabajoDuplicado as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        tarea = asyncio.ensure_future(asyncio.to_thread(funcion, *args, cancelacion=cancelacion, **kwargs))
+        while not tarea.done():
+            await asyncio.wait({tarea}, timeout=INTERVALO_DESCONEXION_SEGUNDOS)
+            if not tarea.done() and not cancelacion.cancelado and await http_request.is_disconnected():
+                print(f"API: Cliente desconectado. Cancelando trabajo {job_id}...")
+                cancelacion.cancelar("cliente desconectado")
+        resultado = tarea.result()
+        if cancelacion.cancelado:
+            raise HTTPException(status_code=499, detail=f"Trabajo {job_id} cancelado: {cancelacion.motivo}")
+        return job_id, resultado
+
 
 # --- Lógica de la API de FastAPI ---
 app = FastAPI(title="Extractor API", description="API para procesar y generar multimedia.")
@@ -102,28 +167,47 @@ async def api_sintetizar(request: SynthesisRequest):
 def root():
     return RedirectResponse(url="/gradio")
 
+@app.post("/api/jobs/{job_id}/cancel")
+def api_cancel_job(job_id: str):
+    if not cancelar_trabajo(job_id):
+        raise HTTPException(status_code=404, detail=f"No hay un trabajo en curso con id '{job_id}'.")
+    return {"message": "Cancelación solicitada", "job_id": job_id}
+
 @app.post("/api/download")
-def api_download(request: DownloadRequest):
-    path, error_msg = descargar_video_youtube(request.url, request.start_time, request.end_time)
+async def api_download(request: DownloadRequest, http_request: Request):
+    job_id, (path, error_msg) = await ejecutar_trabajo(http_request, request.job_id, descargar_video_youtube, request.url, request.start_time, request.end_time)
     if error_msg:
         raise HTTPException(status_code=500, detail=f"Error al descargar el video: {error_msg}")
-    return {"message": "Video descargado con éxito", "path": path}
+    return {"message": "Video descargado con éxito", "path": path, "job_id": job_id}
 
 @app.post("/api/extract_audio")
-def api_extract_audio(request: FilePathRequest):
-    path = extraer_audio(request.file_path)
+async def api_extract_audio(request: ExtractAudioRequest, http_request: Request):
+    job_id, path = await ejecutar_trabajo(http_request, request.job_id, extraer_audio, request.file_path)
     if not path:
         raise HTTPException(status_code=500, detail="Error al extraer el audio.")
-    return {"message": "Audio extraído con éxito", "path": path}
+    return {"message": "Audio extraído con éxito", "path": path, "job_id": job_id}
 
 @app.post("/api/transcribe")
-def api_transcribe(request: TranscriptionRequest):
-    path, _ = transcribir_y_diarizar(request.file_path, diarizar=request.diarize, model_size=request.model_size)
+async def api_transcribe(request: TranscriptionRequest, http_request: Request):
+    if request.asr_backend not in MOTORES_ASR:
+        raise HTTPException(status_code=400, detail=f"Motor ASR no soportado. Opciones: {', '.join(MOTORES_ASR)}")
+    job_id, (path, _, vad_metrics) = await ejecutar_trabajo(
+        http_request, request.job_id, transcribir_y_diarizar, request.file_path,
+        diarizar=request.diarize, model_size=request.model_size, motor_asr=request.asr_backend,
+        beam_size=request.beam_size, vad=request.vad, reanudable=request.resumable
+    )
     if not path:
         raise HTTPException(status_code=500, detail="Error al transcribir.")
     with open(path, 'r', encoding='utf-8') as f:
         transcription = f.read()
-    return {"message": "Transcripción completada", "path": path, "transcription": transcription}
+    return {"message": "Transcripción completada", "path": path, "transcription": transcription, "vad": vad_metrics, "job_id": job_id}
+
+@app.post("/api/detect-language")
+def api_detect_language(request: AudioRequest):
+    language, probabilities = sondear_idioma_audio(request.file_path)
+    if not language:
+        raise HTTPException(status_code=500, detail="Error al detectar el idioma del audio.")
+    return {"language": language, "probabilities": probabilities}
 
 @app.post("/api/synthesize")
 def api_synthesize(request: FilePathRequest):
@@ -140,15 +224,33 @@ def api_translate_text(request: TranslateTextRequest):
     return {"original_text": request.text, "translated_text": translated_text}
 
 @app.post("/api/translate-audio")
-def api_translate_audio(request: AudioRequest):
-    audio_path, transcript_path = traducir_y_sintetizar_audio(request.file_path)
+async def api_translate_audio(request: AudioRequest, http_request: Request):
+    job_id, (audio_path, transcript_path) = await ejecutar_trabajo(http_request, request.job_id, traducir_y_sintetizar_audio, request.file_path)
     if not audio_path or not transcript_path:
         raise HTTPException(status_code=500, detail="Error durante la traducción del audio")
-    return {"message": "Traducción de audio completada", "translated_audio_path": audio_path, "translated_transcript_path": transcript_path}
+    return {"message": "Traducción de audio completada", "translated_audio_path": audio_path, "translated_transcript_path": transcript_path, "job_id": job_id}
+
+@app.post("/api/process")
+async def api_process(request: ProcessRequest, http_request: Request):
+    """Descarga, transcribe, traduce y sintetiza en un solo trabajo; solo se guardan en disco los `artifacts` pedidos."""
+    if request.asr_backend not in MOTORES_ASR:
+        raise HTTPException(status_code=400, detail=f"Motor ASR no soportado. Opciones: {', '.join(MOTORES_ASR)}")
+    if set(request.artifacts) - set(ARTEFACTOS):
+        raise HTTPException(status_code=400, detail=f"Artefacto no soportado. Opciones: {', '.join(ARTEFACTOS)}")
+    if 'video' in request.artifacts and not request.source.startswith(('http://', 'https://')):
+        raise HTTPException(status_code=400, detail="El artefacto 'video' solo está disponible cuando la fuente es una URL.")
+    job_id, (resultado, error_msg) = await ejecutar_trabajo(
+        http_request, request.job_id, procesar, request.source, request.start_time, request.end_time,
+        idioma_destino=request.target_language, model_size=request.model_size, motor_asr=request.asr_backend,
+        beam_size=request.beam_size, vad=request.vad, diarizar=request.diarize, artefactos=request.artifacts
+    )
+    if error_msg:
+        raise HTTPException(status_code=500, detail=f"Error en el pipeline: {error_msg}")
+    return {"message": "Pipeline completado", **resultado, "job_id": job_id}
 
 # --- Funciones de la Interfaz de Gradio (Actualizadas para el nuevo diseño) ---
 
-def descargar_video_action(url, start_time, end_time, progress=gr.Progress(track_tqdm=True)):
+def descargar_video_action(url, start_time, end_time, request: gr.Request, progress=gr.Progress(track_tqdm=True)):
     """Acción para descargar el video. Devuelve la ruta y actualiza la UI."""
     if not url:
         raise gr.Error("Por favor, introduce una URL de YouTube.")
@@ -157,7 +259,8 @@ def descargar_video_action(url, start_time, end_time, progress=gr.Progress(track
     end_time = end_time.strip() if end_time else None
     
     progress(0, desc="Descargando video...")
-    ruta_video, error_msg = descargar_video_youtube(url, start_time, end_time)
+    with trabajo(sesion=request.session_hash) as (_, cancelacion):
+        ruta_video, error_msg = descargar_video_youtube(url, start_time, end_time, cancelacion=cancelacion)
     
     if error_msg:
         progress(1)
@@ -172,13 +275,14 @@ def process_uploaded_video(video_file):
         return None, "", None, gr.Accordion(open=True), gr.Accordion(open=False)
     return video_file.name, "Video cargado. Listo para extraer audio.", gr.Video(value=video_file.name), gr.Accordion(open=False), gr.Accordion(open=True)
 
-def extraer_audio_action(ruta_video, progress=gr.Progress(track_tqdm=True)):
+def extraer_audio_action(ruta_video, request: gr.Request, progress=gr.Progress(track_tqdm=True)):
     """Acción para extraer el audio. Devuelve la ruta del audio y actualiza la UI."""
     if not ruta_video:
         raise gr.Error("No hay un video para procesar. Completa el PASO 1.")
 
     progress(0, desc="Extrayendo audio...")
-    ruta_audio = extraer_audio(ruta_video)
+    with trabajo(sesion=request.session_hash) as (_, cancelacion):
+        ruta_audio = extraer_audio(ruta_video, cancelacion=cancelacion)
     progress(1)
 
     if not ruta_audio:
@@ -192,15 +296,20 @@ def process_uploaded_audio(audio_file):
         return "", None, None, gr.Accordion(open=True), gr.Accordion(open=False)
     return "Audio cargado. Listo para transcribir.", gr.Audio(value=audio_file.name, type="filepath"), audio_file.name, gr.Accordion(open=False), gr.Accordion(open=True)
 
-def transcribir_action(ruta_audio, model_size, diarizar, progress=gr.Progress(track_tqdm=True)):
+def transcribir_action(ruta_audio, model_size, diarizar, motor_asr, vad, request: gr.Request, progress=gr.Progress(track_tqdm=True)):
     """Acción para transcribir el audio y mostrar el resultado."""
     if not ruta_audio:
         raise gr.Error("No hay un archivo de audio para transcribir. Completa el PASO 2.")
 
-    progress(0, desc=f"Transcribiendo con el modelo {model_size}...")
-    ruta_transcripcion, _ = transcribir_y_diarizar(ruta_audio, diarizar=diarizar, model_size=model_size)
-    progress(1)
+    with trabajo(sesion=request.session_hash) as (_, cancelacion):
+        ruta_transcripcion, _, _ = transcribir_y_diarizar(
+            ruta_audio, diarizar=diarizar, model_size=model_size, motor_asr=motor_asr, vad=vad,
+            progreso=lambda fraccion, descripcion: progress(fraccion, desc=descripcion),
+            cancelacion=cancelacion
+        )
     
+    if cancelacion.cancelado:
+        raise gr.Error(f"Transcripción cancelada: {cancelacion.motivo}.")
     if not ruta_transcripcion:
         raise gr.Error("La transcripción falló. Revisa los registros para más detalles.")
 
@@ -219,15 +328,19 @@ def process_uploaded_transcript(transcript_file):
     
     return f"Transcripción cargada desde {os.path.basename(transcript_file.name)}", contenido, transcript_file.name, gr.Accordion(open=False), gr.Accordion(open=True), gr.Accordion(open=True)
 
-def traducir_action(ruta_audio, progress=gr.Progress(track_tqdm=True)):
+def traducir_action(ruta_audio, request: gr.Request, progress=gr.Progress(track_tqdm=True)):
     """Acción para traducir y sintetizar el audio, manejando la actualización de la UI."""
     if not ruta_audio:
         raise gr.Error("No hay un archivo de audio para traducir. Completa el PASO 2.")
 
-    progress(0, desc="Traduciendo y sintetizando...")
-    ruta_audio_traducido, ruta_transcripcion_traducida = traducir_y_sintetizar_audio(ruta_audio)
-    progress(1)
+    with trabajo(sesion=request.session_hash) as (_, cancelacion):
+        ruta_audio_traducido, ruta_transcripcion_traducida = traducir_y_sintetizar_audio(
+            ruta_audio, progreso=lambda fraccion, descripcion: progress(fraccion, desc=descripcion),
+            cancelacion=cancelacion
+        )
 
+    if cancelacion.cancelado:
+        raise gr.Error(f"Traducción cancelada: {cancelacion.motivo}.")
     if not ruta_audio_traducido:
         raise gr.Error("El proceso de traducción y síntesis falló.")
 
@@ -282,6 +395,17 @@ def sintetizar_manual_action(texto_original, texto_traducido, lang, progress=gr.
 
     return f"Síntesis completada.", gr.Audio(value=ruta_audio, type="filepath")
 
+def cancelar_action(request: gr.Request):
+    """Cancela los trabajos en curso de la sesión (descarga, extracción, transcripción o traducción)."""
+    cancelados = cancelar_trabajos_de_sesion(request.session_hash)
+    if not cancelados:
+        return "No hay trabajos en curso para cancelar."
+    return f"Cancelación solicitada para {cancelados} trabajo(s)."
+
+def cancelar_al_salir(request: gr.Request):
+    """Cancela los trabajos de la sesión cuando el usuario cierra la pestaña."""
+    cancelar_trabajos_de_sesion(request.session_hash, motivo="sesión cerrada")
+
 def listar_archivos(directorio):
     """Lista los archivos en un directorio dado, devolviendo un mensaje si está vacío."""
     ruta_completa = os.path.join(os.getcwd(), directorio)
@@ -303,7 +427,9 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="sky")) as demo:
     with gr.Tabs():
         with gr.TabItem("🛠️ Extractor Principal"):
             gr.Markdown("## Flujo de Trabajo Completo")
-            status_text = gr.Textbox(label="Estado del Proceso", interactive=False, lines=1, max_lines=1)
+            with gr.Row():
+                status_text = gr.Textbox(label="Estado del Proceso", interactive=False, lines=1, max_lines=1, scale=4)
+                cancelar_btn = gr.Button("⏹️ Cancelar", variant="stop", scale=1)
             with gr.Row():
                 with gr.Column(scale=1):
                     with gr.Accordion("PASO 1: 📥 Video", open=True) as download_accordion:
@@ -326,6 +452,9 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="sky")) as demo:
                         with gr.Row():
                             modelo_whisper_input = gr.Dropdown(["tiny", "base", "small", "medium", "large"], value="medium", label="Modelo Whisper")
                             diarizar_checkbox = gr.Checkbox(label="Diarizar", value=True)
+                        with gr.Row():
+                            motor_asr_input = gr.Dropdown(MOTORES_ASR, value=MOTOR_ASR_POR_DEFECTO, label="Motor ASR")
+                            vad_checkbox = gr.Checkbox(label="Omitir silencios (VAD)", value=False)
                         gr.Markdown("<div style='text-align: center;'>--- O ---</div>")
                         upload_transcript_btn = gr.UploadButton("📁 Cargar Transcripción (.txt)", file_types=[".txt"], variant="primary")
 
@@ -379,36 +508,48 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="sky")) as demo:
             file_list_display = gr.Textbox(label="Archivos", lines=15, interactive=False)
 
     # --- Lógica de la Interfaz ---
-    descargar_btn.click(fn=descargar_video_action, inputs=[youtube_url, start_time_input, end_time_input], outputs=[video_path_state, status_text, video_player, download_accordion, audio_accordion])
-    upload_video_btn.upload(fn=process_uploaded_video, inputs=[upload_video_btn], outputs=[video_path_state, status_text, video_player, download_accordion, audio_accordion])
+    cola_pesada = dict(concurrency_id=COLA_PESADA, concurrency_limit=LIMITE_COLA_PESADA)
+    cola_media = dict(concurrency_id=COLA_MEDIA, concurrency_limit=LIMITE_COLA_MEDIA)
+    cola_ligera = dict(concurrency_id=COLA_LIGERA, concurrency_limit=LIMITE_COLA_LIGERA)
 
-    extraer_btn.click(fn=extraer_audio_action, inputs=[video_path_state], outputs=[status_text, audio_original, audio_path_state, audio_accordion, transcribe_accordion])
-    upload_audio_btn.upload(fn=process_uploaded_audio, inputs=[upload_audio_btn], outputs=[status_text, audio_original, audio_path_state, audio_accordion, transcribe_accordion])
+    descargar_btn.click(fn=descargar_video_action, inputs=[youtube_url, start_time_input, end_time_input], outputs=[video_path_state, status_text, video_player, download_accordion, audio_accordion], **cola_media)
+    upload_video_btn.upload(fn=process_uploaded_video, inputs=[upload_video_btn], outputs=[video_path_state, status_text, video_player, download_accordion, audio_accordion], **cola_ligera)
 
-    transcribir_btn.click(fn=transcribir_action, inputs=[audio_path_state, modelo_whisper_input, diarizar_checkbox], outputs=[status_text, transcripcion_texto, transcription_path_state, transcribe_accordion, translate_accordion, synthesize_accordion])
-    upload_transcript_btn.upload(fn=process_uploaded_transcript, inputs=[upload_transcript_btn], outputs=[status_text, transcripcion_texto, transcription_path_state, transcribe_accordion, translate_accordion, synthesize_accordion])
+    extraer_btn.click(fn=extraer_audio_action, inputs=[video_path_state], outputs=[status_text, audio_original, audio_path_state, audio_accordion, transcribe_accordion], **cola_media)
+    upload_audio_btn.upload(fn=process_uploaded_audio, inputs=[upload_audio_btn], outputs=[status_text, audio_original, audio_path_state, audio_accordion, transcribe_accordion], **cola_ligera)
 
-    traducir_btn.click(fn=traducir_action, inputs=[audio_path_state], outputs=[status_text, audio_traducido, transcripcion_traducida])
-    sintetizar_btn.click(fn=sintetizar_action, inputs=[transcription_path_state], outputs=[status_text, audio_sintetizado])
+    transcribir_btn.click(fn=transcribir_action, inputs=[audio_path_state, modelo_whisper_input, diarizar_checkbox, motor_asr_input, vad_checkbox], outputs=[status_text, transcripcion_texto, transcription_path_state, transcribe_accordion, translate_accordion, synthesize_accordion], **cola_pesada)
+    upload_transcript_btn.upload(fn=process_uploaded_transcript, inputs=[upload_transcript_btn], outputs=[status_text, transcripcion_texto, transcription_path_state, transcribe_accordion, translate_accordion, synthesize_accordion], **cola_ligera)
+
+    traducir_btn.click(fn=traducir_action, inputs=[audio_path_state], outputs=[status_text, audio_traducido, transcripcion_traducida], **cola_pesada)
+    sintetizar_btn.click(fn=sintetizar_action, inputs=[transcription_path_state], outputs=[status_text, audio_sintetizado], **cola_ligera)
 
     # Lógica de traducción y síntesis manual
     traducir_manual_btn.click(
         fn=traducir_manual_action,
         inputs=[manual_text_input, source_lang_dropdown, lang_dropdown],
-        outputs=[translated_text_output]
+        outputs=[translated_text_output],
+        **cola_ligera
     )
 
     sintetizar_manual_btn.click(
         fn=sintetizar_manual_action,
         inputs=[manual_text_input, translated_text_output, lang_dropdown],
-        outputs=[manual_status_text, manual_audio_output]
+        outputs=[manual_status_text, manual_audio_output],
+        **cola_ligera
     )
 
+    cancelar_btn.click(fn=cancelar_action, outputs=[status_text], **cola_ligera)
+    demo.unload(cancelar_al_salir)
+
     # Lógica del visor de archivos
-    ver_videos_btn.click(fn=lambda: listar_archivos("videos"), outputs=file_list_display)
-    ver_audios_btn.click(fn=lambda: listar_archivos("audios"), outputs=file_list_display)
-    ver_sintetizados_btn.click(fn=lambda: listar_archivos("audio_sintetizado"), outputs=file_list_display)
-    ver_transcripciones_btn.click(fn=lambda: listar_archivos("transcripciones"), outputs=file_list_display)
+    ver_videos_btn.click(fn=lambda: listar_archivos("videos"), outputs=file_list_display, **cola_ligera)
+    ver_audios_btn.click(fn=lambda: listar_archivos("audios"), outputs=file_list_display, **cola_ligera)
+    ver_sintetizados_btn.click(fn=lambda: listar_archivos("audio_sintetizado"), outputs=file_list_display, **cola_ligera)
+    ver_transcripciones_btn.click(fn=lambda: listar_archivos("transcripciones"), outputs=file_list_display, **cola_ligera)
+
+# La cola muestra a cada usuario su posición y el tiempo estimado de espera.
+demo.queue(default_concurrency_limit=LIMITE_COLA_LIGERA, max_size=TAMANO_MAXIMO_COLA)
 
 # Montar la aplicación de Gradio en la API de FastAPI en la ruta /gradio
 app = gr.mount_gradio_app(app, demo, path="/gradio")
@@ -0,0 +1,57 @@
+"""
+Compara los motores ASR sobre un audio local: factor de tiempo real (RTF) y tasa de error por palabra (WER).
+
+Uso:
+    python benchmark_asr.py --audio fixture.wav --referencia fixture.txt --model-size small
+"""
+import argparse
+import re
+import time
+
+import whisper
+
+from motores_asr import MOTORES_ASR, transcribir
+
+
+def normalizar(texto):
+    return re.sub(r"[^\w\s']", " ", texto.lower()).split()
+
+def calcular_wer(referencia, hipotesis):
+    """WER = distancia de edición entre palabras / número de palabras de la referencia."""
+    ref, hip = normalizar(referencia), normalizar(hipotesis)
+    if not ref:
+        return 0.0 if not hip else 1.0
+    anterior = list(range(len(hip) + 1))
+    for i, palabra_ref in enumerate(ref, start=1):
+        actual = [i] + [0] * len(hip)
+        for j, palabra_hip in enumerate(hip, start=1):
+            actual[j] = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (palabra_ref != palabra_hip))
+        anterior = actual
+    return anterior[-1] / len(ref)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de motores ASR (RTF y WER).")
+    parser.add_argument('--audio', type=str, required=True, help="Audio de prueba.")
+    parser.add_argument('--referencia', type=str, required=True, help="Transcripción de referencia (.txt).")
+    parser.add_argument('--model-size', type=str, default="small", help="Tamaño del modelo a comparar.")
+    parser.add_argument('--beam-size', type=int, default=5, help="Tamaño del beam search.")
+    parser.add_argument('--motores', type=str, nargs='+', default=MOTORES_ASR, help="Motores a comparar.")
+    args = parser.parse_args()
+
+    duracion_audio = len(whisper.load_audio(args.audio)) / whisper.audio.SAMPLE_RATE
+    with open(args.referencia, 'r', encoding='utf-8') as f:
+        referencia = f.read()
+
+    print(f"Audio: {args.audio} ({duracion_audio:.1f}s), modelo: {args.model_size}, beam: {args.beam_size}\n")
+    print(f"{'Motor':<16}{'Tiempo (s)':>12}{'RTF':>8}{'WER':>8}")
+    for motor in args.motores:
+        # Carga en frío fuera de la medición para comparar solo la transcripción.
+        transcribir(args.audio, motor=motor, model_size=args.model_size, beam_size=args.beam_size)
+
+        inicio = time.perf_counter()
+        resultado = transcribir(args.audio, motor=motor, model_size=args.model_size, beam_size=args.beam_size)
+        transcurrido = time.perf_counter() - inicio
+
+        wer = calcular_wer(referencia, resultado["text"])
+        print(f"{motor:<16}{transcurrido:>12.2f}{transcurrido / duracion_audio:>8.3f}{wer:>8.1%}")
@@ -0,0 +1,67 @@
+"""
+Mide la memoria pico del ensamblado de transcripciones con hablantes sobre flujos sintéticos de palabras.
+La transcripción se escribe en /dev/null para medir solo el ensamblado.
+
+Uso:
+    python benchmark_memoria_transcripcion.py --horas 1 10
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from collections import namedtuple
+
+from extractor import escribir_transcripcion_con_hablantes, iterar_palabras, iterar_segmentos_con_hablantes
+
+Turno = namedtuple('Turno', ['start', 'end'])
+
+PALABRAS_POR_SEGUNDO = 2.5
+DURACION_TURNO = 12.0
+DURACION_SEGMENTO = 5.0
+
+
+class DiarizacionSintetica:
+    """Imita `itertracks` de pyannote alternando dos hablantes cada DURACION_TURNO segundos."""
+
+    def __init__(self, duracion):
+        self.duracion = duracion
+
+    def itertracks(self, yield_label=False):
+        inicio, i = 0.0, 0
+        while inicio < self.duracion:
+            yield Turno(inicio, inicio + DURACION_TURNO), i, f"SPEAKER_{i % 2:02d}"
+            inicio += DURACION_TURNO
+            i += 1
+
+def segmentos_sinteticos(duracion):
+    """Genera segmentos con el formato de Whisper sin mantenerlos en memoria."""
+    paso = 1 / PALABRAS_POR_SEGUNDO
+    inicio = 0.0
+    while inicio < duracion:
+        palabras = []
+        t = inicio
+        while t < inicio + DURACION_SEGMENTO:
+            palabras.append({"word": " palabra", "start": t, "end": t + paso * 0.8})
+            t += paso
+        yield {"start": inicio, "end": t, "words": palabras}
+        inicio = t
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de memoria del ensamblado de transcripciones.")
+    parser.add_argument('--horas', type=float, nargs='+', default=[1, 10], help="Duraciones sintéticas a medir.")
+    args = parser.parse_args()
+
+    print(f"{'Horas':>6}{'Palabras':>12}{'Tiempo (s)':>12}{'Pico (MiB)':>12}")
+    for horas in args.horas:
+        duracion = horas * 3600
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        with open(os.devnull, "w", encoding='utf-8') as f:
+            segmentos = iterar_segmentos_con_hablantes(DiarizacionSintetica(duracion), iterar_palabras(segmentos_sinteticos(duracion)))
+            escribir_transcripcion_con_hablantes(segmentos, f)
+        transcurrido = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        palabras = int(duracion * PALABRAS_POR_SEGUNDO)
+        print(f"{horas:>6g}{palabras:>12,}{transcurrido:>12.2f}{pico / 2**20:>12.2f}")
@@ -0,0 +1,167 @@
+import base64
+import random
+import re
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from gtts import gTTS
+from gtts.tts import gTTSError
+
+# --- CONFIGURACIÓN ---
+URL_TRADUCCION = 'https://translate.googleapis.com/translate_a/single'
+LIMITE_CARACTERES_TRADUCCION = 4500
+LIMITE_CONEXIONES_POR_HOST = 4
+TIMEOUT_SEGUNDOS = 30
+MAX_REINTENTOS = 4
+ESPERA_BASE_SEGUNDOS = 0.5
+ESPERA_MAXIMA_SEGUNDOS = 16
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+_sesion = None
+_semaforos_por_host = {}
+_candado = threading.Lock()
+
+# --- SESIÓN COMPARTIDA ---
+
+def obtener_sesion():
+    """Devuelve la sesión HTTP compartida (keep-alive y pool de conexiones por host)."""
+    global _sesion
+    with _candado:
+        if _sesion is None:
+            sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=8, pool_maxsize=LIMITE_CONEXIONES_POR_HOST, max_retries=0)
+            sesion.mount('https://', adaptador)
+            sesion.mount('http://', adaptador)
+            _sesion = sesion
+        return _sesion
+
+def _semaforo_para(host):
+    with _candado:
+        if host not in _semaforos_por_host:
+            _semaforos_por_host[host] = threading.BoundedSemaphore(LIMITE_CONEXIONES_POR_HOST)
+        return _semaforos_por_host[host]
+
+def _calcular_espera(intento, retry_after=None):
+    """Backoff exponencial con jitter completo; respeta `Retry-After` si el servidor lo envía."""
+    if retry_after:
+        try:
+            return min(float(retry_after), ESPERA_MAXIMA_SEGUNDOS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(ESPERA_MAXIMA_SEGUNDOS, ESPERA_BASE_SEGUNDOS * (2 ** intento)))
+
+def _esperar(segundos):
+    """Pausa entre reintentos (separada de `time.sleep` para poder sustituirla en las pruebas)."""
+    time.sleep(segundos)
+
+def enviar(preparada, timeout=TIMEOUT_SEGUNDOS, proxies=None):
+    """
+    Envía una petición preparada por la sesión compartida, limitando la concurrencia por host
+    y reintentando errores de conexión y respuestas 429/5xx.
+    Devuelve la respuesta final; lanza `requests.HTTPError` si sigue fallando tras los reintentos.
+    """
+    host = urlsplit(preparada.url).netloc
+    sesion = obtener_sesion()
+
+    for intento in range(MAX_REINTENTOS + 1):
+        try:
+            with _semaforo_para(host):
+                respuesta = sesion.send(preparada, timeout=timeout, proxies=proxies)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if intento == MAX_REINTENTOS:
+                raise
+            espera = _calcular_espera(intento)
+            print(f"WARNING: Error de conexión con '{host}' ({e}). Reintentando en {espera:.2f}s...")
+        else:
+            if respuesta.status_code not in CODIGOS_REINTENTABLES or intento == MAX_REINTENTOS:
+                respuesta.raise_for_status()
+                return respuesta
+            espera = _calcular_espera(intento, respuesta.headers.get('Retry-After'))
+            print(f"WARNING: '{host}' respondió {respuesta.status_code}. Reintentando en {espera:.2f}s...")
+            respuesta.close()
+        _esperar(espera)
+
+def solicitar(metodo, url, **kwargs):
+    """Atajo de `enviar` para construir y enviar una petición en un solo paso."""
+    preparada = obtener_sesion().prepare_request(requests.Request(metodo, url, **kwargs))
+    return enviar(preparada)
+
+# --- TRADUCCIÓN ---
+
+def _dividir_texto(texto, limite=None):
+    """
+    Divide el texto en fragmentos de como máximo `limite` caracteres (por defecto, LIMITE_CARACTERES_TRADUCCION),
+    cortando en saltos de línea o espacios.
+    """
+    limite = limite or LIMITE_CARACTERES_TRADUCCION
+    fragmentos = []
+    while len(texto) > limite:
+        corte = texto.rfind('\n', 0, limite)
+        if corte <= 0:
+            corte = texto.rfind(' ', 0, limite)
+        if corte <= 0:
+            corte = limite
+        fragmentos.append(texto[:corte])
+        texto = texto[corte:]
+    if texto:
+        fragmentos.append(texto)
+    return fragmentos
+
+def _consultar_traductor(texto, idioma_origen, idioma_destino):
+    respuesta = solicitar(
+        'POST',
+        URL_TRADUCCION,
+        params={'client': 'gtx', 'sl': idioma_origen, 'tl': idioma_destino, 'dt': 't'},
+        data={'q': texto},
+    )
+    datos = respuesta.json()
+    traduccion = "".join(parte[0] for parte in (datos[0] or []) if parte and parte[0])
+    idioma_detectado = datos[2] if len(datos) > 2 else None
+    return traduccion, idioma_detectado
+
+def traducir(texto, idioma_origen='auto', idioma_destino='es'):
+    """Traduce el texto completo, dividiéndolo en fragmentos si supera el límite del servicio."""
+    partes = []
+    for fragmento in _dividir_texto(texto):
+        if not fragmento.strip():
+            partes.append(fragmento)
+            continue
+        # Conservar el separador en el que se cortó el fragmento; se envía sin él para no duplicarlo.
+        contenido = fragmento.lstrip()
+        traduccion, _ = _consultar_traductor(contenido, idioma_origen, idioma_destino)
+        partes.append(fragmento[:len(fragmento) - len(contenido)] + traduccion)
+    return "".join(partes)
+
+def detectar(texto):
+    """Devuelve el código del idioma detectado para el texto (se usa solo el primer fragmento)."""
+    _, idioma_detectado = _consultar_traductor(_dividir_texto(texto)[0], 'auto', 'en')
+    return idioma_detectado
+
+# --- SÍNTESIS ---
+
+class gTTSAgrupado(gTTS):
+    """
+    gTTS que envía sus peticiones por la sesión compartida en lugar de abrir una sesión por fragmento.
+    Reproduce `gTTS.stream` de gTTS 2.5.4 (versión fijada en requirements.txt), que usa `_prepare_requests`.
+    """
+
+    def stream(self):
+        for pr in self._prepare_requests():
+            try:
+                r = enviar(pr, timeout=self.timeout, proxies=urllib.request.getproxies())
+            except requests.exceptions.HTTPError as e:
+                raise gTTSError(tts=self, response=e.response)
+            except requests.exceptions.RequestException:
+                raise gTTSError(tts=self)
+
+            for line in r.iter_lines(chunk_size=1024):
+                decoded_line = line.decode("utf-8")
+                if "jQ1olc" in decoded_line:
+                    audio_search = re.search(r'jQ1olc","\[\\"(.*)\\"]', decoded_line)
+                    if not audio_search:
+                        raise gTTSError(tts=self, response=r)
+                    yield base64.b64decode(audio_search.group(1).encode("ascii"))
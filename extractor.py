@@ -1,12 +1,13 @@
 import subprocess
 import sys
 import os
-import whisper
+import time
 import torch
 from pyannote.audio import Pipeline
 import pandas as pd
-from gtts import gTTS
-from deep_translator import GoogleTranslator
+from clientes_http import gTTSAgrupado, traducir, detectar
+from trabajos import OperacionCancelada, ejecutar_comando, token_de_etapa
+from motores_asr import MOTORES_ASR, MOTOR_ASR_POR_DEFECTO, transcribir, detectar_idioma_audio, modelo_para_idioma
 from datetime import datetime
 
 # Importar la configuración local
@@ -21,17 +22,28 @@ CARPETA_AUDIOS = 'audios'
 CARPETA_TRANSCRIPCIONES = 'transcripciones'
 CARPETA_AUDIO_SINTETIZADO = 'audio_sintetizado'
 CARPETA_TEST_OUTPUTS = 'test_outputs'
+CARPETA_CHECKPOINTS = 'checkpoints'
+# Probabilidad mínima para confiar en el idioma detectado con la primera ventana de audio.
+UMBRAL_CONFIANZA_IDIOMA = 0.5
+# Plazos máximos por etapa (segundos). Al vencer, la etapa se cancela y sus procesos se terminan.
+PLAZO_DESCARGA = 60 * 60
+PLAZO_EXTRACCION = 30 * 60
+PLAZO_TRANSCRIPCION = 6 * 60 * 60
 
 # --- FUNCIONES DE UTILIDAD ---
 
 def crear_carpetas_necesarias():
     """Asegura que todas las carpetas necesarias para el proyecto existan."""
-    for carpeta in [CARPETA_VIDEOS, CARPETA_AUDIOS, CARPETA_TRANSCRIPCIONES, CARPETA_AUDIO_SINTETIZADO, CARPETA_TEST_OUTPUTS]:
+    for carpeta in [CARPETA_VIDEOS, CARPETA_AUDIOS, CARPETA_TRANSCRIPCIONES, CARPETA_AUDIO_SINTETIZADO, CARPETA_TEST_OUTPUTS, CARPETA_CHECKPOINTS]:
         os.makedirs(carpeta, exist_ok=True)
 
+def limpiar_nombre_archivo(nombre):
+    """Deja solo letras, dígitos, espacios, '_' y '-' para usar el nombre en rutas de salida."""
+    return "".join([c for c in nombre if c.isalpha() or c.isdigit() or c in (' ', '_', '-')]).rstrip()
+
 # --- FUNCIONES DE EXTRACCIÓN ---
 
-def extraer_audio(ruta_video):
+def extraer_audio(ruta_video, cancelacion=None):
     if not os.path.exists(ruta_video):
         print(f"ERROR: El archivo '{ruta_video}' no fue encontrado.")
         return None
@@ -43,14 +55,19 @@ def extraer_audio(ruta_video):
     print(f"INFO: Iniciando extracción de audio de '{ruta_video}'...")
     comando = ['ffmpeg', '-i', ruta_video, '-q:a', '0', '-map', 'a', '-y', ruta_salida_mp3]
     try:
-        subprocess.run(comando, check=True, capture_output=True, text=True)
+        ejecutar_comando(comando, cancelacion=token_de_etapa(cancelacion, PLAZO_EXTRACCION), text=True)
         print(f"SUCCESS: Audio guardado en '{ruta_salida_mp3}'")
         return ruta_salida_mp3
     except subprocess.CalledProcessError as e:
         print(f"ERROR con FFmpeg extrayendo audio: {e.stderr}")
         return None
+    except OperacionCancelada as e:
+        print(f"ERROR: Extracción de audio cancelada ({e}).")
+        if os.path.exists(ruta_salida_mp3):
+            os.remove(ruta_salida_mp3)
+        return None
 
-def descargar_video_youtube(url, start_time=None, end_time=None):
+def descargar_video_youtube(url, start_time=None, end_time=None, cancelacion=None):
     """
     Descarga un video de YouTube, opcionalmente cortando un segmento específico.
     Optimizado para velocidad forzando el formato MP4 y con validación de tiempo mejorada.
@@ -58,6 +75,7 @@ def descargar_video_youtube(url, start_time=None, end_time=None):
     """
     print(f"INFO: Iniciando descarga de video desde: {url}")
     os.makedirs(CARPETA_VIDEOS, exist_ok=True)
+    cancelacion = token_de_etapa(cancelacion, PLAZO_DESCARGA)
 
     # --- Validar y procesar tiempos de forma robusta ---
     cortar_video = bool(start_time and end_time)
@@ -79,10 +97,10 @@ def descargar_video_youtube(url, start_time=None, end_time=None):
     # --- Determinar la ruta de salida de forma robusta ---
     try:
         get_name_cmd = ['yt-dlp', '--get-filename', '-o', '%(title)s.%(ext)s', url]
-        nombre_base_original = subprocess.run(get_name_cmd, check=True, capture_output=True, text=True, encoding='utf-8').stdout.strip()
+        nombre_base_original = ejecutar_comando(get_name_cmd, cancelacion=cancelacion, text=True, encoding='utf-8').stdout.strip()
         
         nombre_base, extension = os.path.splitext(nombre_base_original)
-        nombre_base_limpio = "".join([c for c in nombre_base if c.isalpha() or c.isdigit() or c in (' ', '_', '-')]).rstrip()
+        nombre_base_limpio = limpiar_nombre_archivo(nombre_base)
 
         if cortar_video:
             nombre_final = f"{nombre_base_limpio}_cut_{start_time.replace(':', '')}_{end_time.replace(':', '')}.mp4"
@@ -95,6 +113,10 @@ def descargar_video_youtube(url, start_time=None, end_time=None):
         error_msg = f"No se pudo obtener el nombre del archivo de yt-dlp: {e.stderr}"
         print(f"ERROR: {error_msg}")
         return None, error_msg
+    except OperacionCancelada as e:
+        error_msg = f"Descarga cancelada ({e})."
+        print(f"ERROR: {error_msg}")
+        return None, error_msg
 
     # --- Construir y ejecutar el comando de descarga optimizado ---
     # Forzar formato a MP4 para optimizar el corte y evitar re-codificación.
@@ -111,7 +133,7 @@ def descargar_video_youtube(url, start_time=None, end_time=None):
     # --- Ejecutar el comando ---
     try:
         print(f"INFO: Ejecutando comando: {' '.join(comando)}")
-        resultado = subprocess.run(comando, check=True, capture_output=True, text=True, encoding='utf-8')
+        resultado = ejecutar_comando(comando, cancelacion=cancelacion, text=True, encoding='utf-8')
         print("SUCCESS: Proceso de descarga de yt-dlp finalizado.")
 
         if os.path.exists(ruta_salida_final):
@@ -133,6 +155,10 @@ def descargar_video_youtube(url, start_time=None, end_time=None):
         else:
             error_msg = f"Falló la descarga con yt-dlp. Error:\n{e.stderr}"
         
+        print(f"ERROR: {error_msg}")
+        return None, error_msg
+    except OperacionCancelada as e:
+        error_msg = f"Descarga cancelada ({e})."
         print(f"ERROR: {error_msg}")
         return None, error_msg
     except Exception as e:
@@ -142,108 +168,162 @@ def descargar_video_youtube(url, start_time=None, end_time=None):
 
 # --- FUNCIONES DE TRANSCRIPCIÓN ---
 
-def transcribir_y_diarizar(ruta_audio, diarizar=True, model_size="medium"):
-    """Transcribe un archivo de audio, devuelve la ruta de la transcripción y el idioma detectado."""
+def transcribir_y_diarizar(ruta_audio, diarizar=True, model_size="medium", motor_asr=MOTOR_ASR_POR_DEFECTO, beam_size=None, vad=False, idioma=None, progreso=None, reanudable=True, cancelacion=None):
+    """
+    Transcribe un archivo de audio. Devuelve (ruta_transcripcion, idioma_detectado, metricas_vad).
+    `motor_asr` selecciona el motor de transcripción ('whisper' o 'faster-whisper' con cuantización int8 en CPU).
+    Con `vad=True` se omiten los tramos sin voz antes de la transcripción y `metricas_vad` indica la duración
+    total, la omitida y la fracción omitida del archivo; sin VAD es None.
+    Si se conoce el `idioma` de antemano, Whisper no lo vuelve a detectar.
+    `progreso(fraccion, descripcion)`, si se indica, se llama al cambiar de etapa y tras cada ventana de ASR.
+    Con `reanudable=True` los audios largos guardan checkpoints; si el proceso se interrumpe,
+    volver a enviar el mismo audio con los mismos parámetros continúa desde el último checkpoint.
+    `cancelacion` (un `TokenCancelacion`) se comprueba entre ventanas de ASR y entre pasos de la diarización.
+    """
+    def informar(fraccion, descripcion):
+        if progreso:
+            progreso(fraccion, descripcion)
+
     if diarizar and not HUGGING_FACE_TOKEN:
         print("ERROR: El token de Hugging Face no está configurado para la diarización.")
-        return None, None
+        return None, None, None
 
-    token = HUGGING_FACE_TOKEN
+    cancelacion = token_de_etapa(cancelacion, PLAZO_TRANSCRIPCION)
 
-    print(f"INFO: Cargando modelo de Whisper ({model_size})...")
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    modelo_whisper = whisper.load_model(model_size, device=device)
     print(f"INFO: Usando dispositivo: {device}")
     
     try:
-        print(f"STEP 1/2: Transcripción para: {ruta_audio}")
-        transcription_result = modelo_whisper.transcribe(ruta_audio, word_timestamps=True)
+        print(f"STEP 1/2: Transcripción ({motor_asr}, {model_size}) para: {ruta_audio}")
+        informar(0, f"Transcribiendo con {motor_asr} ({model_size})...")
+        transcription_result = transcribir(ruta_audio, motor=motor_asr, model_size=model_size, beam_size=beam_size, vad=vad, language=idioma,
+                                          carpeta_checkpoints=CARPETA_CHECKPOINTS if reanudable else None,
+                                          cancelacion=cancelacion,
+                                          progreso=lambda fraccion, descripcion: informar(fraccion * (0.7 if diarizar else 1), descripcion))
+        metricas_vad = transcription_result.get("vad")
+        if metricas_vad:
+            print(f"INFO: VAD omitió {metricas_vad['fraccion_omitida']:.1%} del audio "
+                  f"({metricas_vad['duracion_omitida']:.1f}s de {metricas_vad['duracion_total']:.1f}s).")
         detected_language = transcription_result.get('language', 'unknown')
         print(f"INFO: Idioma detectado: {detected_language}")
 
-        final_transcript_text = ""
-        if diarizar:
-            print("INFO: Cargando modelo de diarización...")
-            diarization_pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1", use_auth_token=token)
-            diarization_pipeline = diarization_pipeline.to(device)
-            
-            print(f"STEP 2/2: Diarización y combinación para: {ruta_audio}")
-            diarization_result = diarization_pipeline(ruta_audio)
-            final_transcript_segments = get_transcript_with_speakers(diarization_result, transcription_result["segments"])
-            
-            for segment in final_transcript_segments:
-                final_transcript_text += f"[{segment['speaker']}] ({segment['start']:.2f}s - {segment['end']:.2f}s)\n"
-                final_transcript_text += f"{segment['text'].strip()}\n\n"
-        else:
-            final_transcript_text = transcription_result["text"]
-
         os.makedirs(CARPETA_TRANSCRIPCIONES, exist_ok=True)
         nombre_base = os.path.splitext(os.path.basename(ruta_audio))[0]
         ruta_salida_txt = os.path.join(CARPETA_TRANSCRIPCIONES, f"{nombre_base}_transcripcion.txt")
 
-        with open(ruta_salida_txt, "w", encoding='utf-8') as f:
-            f.write(final_transcript_text)
+        if diarizar:
+            cancelacion.verificar()
+            informar(0.7, "Diarizando hablantes...")
+            print(f"STEP 2/2: Diarización y combinación para: {ruta_audio}")
+            diarization_result = diarizar_audio(ruta_audio, cancelacion=cancelacion)
+            segmentos = iterar_segmentos_con_hablantes(diarization_result, iterar_palabras(transcription_result["segments"]))
 
-        print(f"SUCCESS: Transcripción guardada en: {ruta_salida_txt}")
-        return ruta_salida_txt, detected_language
+            with open(ruta_salida_txt, "w", encoding='utf-8') as f:
+                escribir_transcripcion_con_hablantes(segmentos, f)
+        else:
+            with open(ruta_salida_txt, "w", encoding='utf-8') as f:
+                f.write(transcription_result["text"])
 
+        print(f"SUCCESS: Transcripción guardada en: {ruta_salida_txt}")
+        if transcription_result.get("checkpoint"):
+            os.remove(transcription_result["checkpoint"])
+        informar(1, "Transcripción completada")
+        return ruta_salida_txt, detected_language, metricas_vad
+
+    except OperacionCancelada as e:
+        print(f"ERROR: Transcripción cancelada ({e}).")
+        return None, None, None
     except Exception as e:
         print(f"ERROR durante el proceso de IA: {e}")
         import traceback
         traceback.print_exc()
-        return None, None
+        return None, None, None
 
-def get_transcript_with_speakers(diarization, whisper_segments):
-    def get_speaker_from_time(time, diarization_result):
-        for turn, _, speaker in diarization_result.itertracks(yield_label=True):
-            if turn.start <= time <= turn.end:
-                return speaker
-        return "[Hablante Desconocido]"
-
-    transcript = []
-    current_speaker = None
-    current_segment = None
+def diarizar_audio(fuente, cancelacion=None):
+    """
+    Ejecuta la diarización de pyannote sobre una ruta de audio o un dict {'waveform', 'sample_rate'} en memoria.
+    La cancelación se comprueba en cada paso del pipeline.
+    """
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print("INFO: Cargando modelo de diarización...")
+    diarization_pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1", use_auth_token=HUGGING_FACE_TOKEN)
+    diarization_pipeline = diarization_pipeline.to(device)
+
+    # pyannote llama al hook en cada paso; así la cancelación interrumpe la diarización.
+    hook = (lambda *args, **kwargs: cancelacion.verificar()) if cancelacion else None
+    return diarization_pipeline(fuente, hook=hook)
 
-    word_list = [word for seg in whisper_segments for word in seg.get('words', [])]
+def iterar_palabras(whisper_segments):
+    """Recorre las palabras de los segmentos de Whisper sin construir una lista intermedia."""
+    for seg in whisper_segments:
+        yield from seg.get('words', [])
+
+def iterar_segmentos_con_hablantes(diarization, palabras):
+    """
+    Agrupa palabras consecutivas del mismo hablante y genera cada segmento en cuanto termina.
+    Los turnos de la diarización se consumen en orden, así que la memoria no crece con la duración del audio.
+    """
+    turnos = diarization.itertracks(yield_label=True)
+    activos = []  # Turnos que ya empezaron y aún pueden contener tiempos posteriores, en orden de inicio.
+    siguiente = next(turnos, None)
+    ultimo_tiempo = float('-inf')
+
+    def get_speaker_from_time(time):
+        nonlocal turnos, activos, siguiente, ultimo_tiempo
+        if time < ultimo_tiempo:
+            # Tiempos fuera de orden: volver a recorrer los turnos desde el principio.
+            turnos = diarization.itertracks(yield_label=True)
+            activos = []
+            siguiente = next(turnos, None)
+        ultimo_tiempo = time
+
+        while siguiente and siguiente[0].start <= time:
+            activos.append(siguiente)
+            siguiente = next(turnos, None)
+        activos = [t for t in activos if t[0].end >= time]
+        return activos[0][2] if activos else "[Hablante Desconocido]"
+
+    current_segment = None
+    current_words = []
 
-    for i, word in enumerate(word_list):
+    for word in palabras:
         word_mid_time = (word['start'] + word['end']) / 2
-        speaker = get_speaker_from_time(word_mid_time, diarization)
+        speaker = get_speaker_from_time(word_mid_time)
 
-        if current_segment and speaker != current_speaker:
-            transcript.append(current_segment)
+        if current_segment and speaker != current_segment["speaker"]:
+            current_segment["text"] = " ".join(current_words)
+            yield current_segment
             current_segment = None
 
         if not current_segment:
-            current_speaker = speaker
-            current_segment = {
-                "speaker": speaker,
-                "text": word['word'].strip(),
-                "start": word['start'],
-                "end": word['end']
-            }
+            current_segment = {"speaker": speaker, "start": word['start'], "end": word['end']}
+            current_words = [word['word'].strip()]
         else:
-            current_segment["text"] += " " + word['word'].strip()
+            current_words.append(word['word'].strip())
             current_segment["end"] = word['end']
-            
+
     if current_segment:
-        transcript.append(current_segment)
+        current_segment["text"] = " ".join(current_words)
+        yield current_segment
+
+def get_transcript_with_speakers(diarization, whisper_segments):
+    return list(iterar_segmentos_con_hablantes(diarization, iterar_palabras(whisper_segments)))
 
-    return transcript
+def escribir_transcripcion_con_hablantes(segmentos, archivo):
+    """Escribe los segmentos en el archivo a medida que se generan."""
+    for segment in segmentos:
+        archivo.write(f"[{segment['speaker']}] ({segment['start']:.2f}s - {segment['end']:.2f}s)\n")
+        archivo.write(f"{segment['text'].strip()}\n\n")
 
 # --- FUNCIONES DE TRADUCCIÓN Y SÍNTESIS ---
 
 def detectar_idioma(texto):
     """Detecta el idioma de un texto dado."""
     try:
-        # La función detect() devuelve un objeto Detected. Ej: Detected(lang=es, confidence=1)
-        detected_obj = GoogleTranslator(source='auto', target='en').detect(texto)
-        # El objeto tiene un atributo 'lang' con el código del idioma.
-        if detected_obj and hasattr(detected_obj, 'lang'):
-            idioma_detectado = detected_obj.lang
+        idioma_detectado = detectar(texto)
+        if idioma_detectado:
             print(f"INFO: Idioma detectado: {idioma_detectado}")
-            return idioma_detectado
-        return None # No se detectó ningún idioma
+        return idioma_detectado
     except Exception as e:
         print(f"ERROR al detectar el idioma: {e}")
         return None
@@ -251,25 +331,63 @@ def detectar_idioma(texto):
 def traducir_texto(texto, idioma_origen='auto', idioma_destino='es'):
     """
     Traduce un texto de un idioma de origen a un idioma de destino.
+    Usa la sesión HTTP compartida (reintentos con backoff en errores 429/5xx).
     """
     try:
         print(f"INFO: Traduciendo texto de '{idioma_origen}' a '{idioma_destino}'...")
-        traducido = GoogleTranslator(source=idioma_origen, target=idioma_destino).translate(texto)
+        traducido = traducir(texto, idioma_origen=idioma_origen, idioma_destino=idioma_destino)
         print("SUCCESS: Texto traducido.")
         return traducido
     except Exception as e:
         print(f"ERROR traduciendo texto: {e}")
         return None
 
-def traducir_y_sintetizar_audio(ruta_audio):
+def sondear_idioma_audio(ruta_audio):
+    """
+    Detecta el idioma hablado a partir de la primera ventana del audio, sin transcribir el archivo completo.
+    Devuelve una tupla (idioma, probabilidades) o (None, None) si falla.
+    """
+    if not os.path.exists(ruta_audio):
+        print(f"ERROR: El archivo '{ruta_audio}' no fue encontrado.")
+        return None, None
+    try:
+        inicio = time.perf_counter()
+        idioma, probabilidades = detectar_idioma_audio(ruta_audio)
+        print(f"INFO: Idioma detectado en la primera ventana: {idioma} ({probabilidades[idioma]:.0%}) "
+              f"en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        return idioma, probabilidades
+    except Exception as e:
+        print(f"ERROR al detectar el idioma del audio: {e}")
+        return None, None
+
+def traducir_y_sintetizar_audio(ruta_audio, model_size="medium", progreso=None, cancelacion=None):
     """
     Traduce y sintetiza audio. Si el audio ya está en español, solo lo sintetiza.
+    El idioma se detecta primero con la ventana inicial del audio para fijar el modelo y el idioma de la transcripción.
+    `progreso(fraccion, descripcion)`, si se indica, se llama al cambiar de etapa.
     """
+    def informar(fraccion, descripcion):
+        if progreso:
+            progreso(fraccion, descripcion)
+
     print(f"--- INICIANDO PROCESO DE TRADUCCIÓN/SÍNTESIS PARA: {ruta_audio} ---")
-    
-    # 1. Transcribir y detectar idioma
-    ruta_transcripcion, idioma_detectado = transcribir_y_diarizar(ruta_audio, diarizar=False)
-    if not ruta_transcripcion:
+
+    # 1. Detectar idioma con la primera ventana y transcribir con ese idioma fijado
+    informar(0, "Detectando idioma...")
+    idioma_sondeado, probabilidades = sondear_idioma_audio(ruta_audio)
+    if idioma_sondeado and probabilidades[idioma_sondeado] < UMBRAL_CONFIANZA_IDIOMA:
+        print("INFO: Detección inicial poco confiable. Whisper detectará el idioma durante la transcripción.")
+        idioma_sondeado = None
+
+    ruta_transcripcion, idioma_detectado, _ = transcribir_y_diarizar(
+        ruta_audio,
+        diarizar=False,
+        model_size=modelo_para_idioma(model_size, idioma_sondeado),
+        idioma=idioma_sondeado,
+        progreso=lambda fraccion, descripcion: informar(0.05 + fraccion * 0.7, descripcion),
+        cancelacion=cancelacion
+    )
+    if not ruta_transcripcion or (cancelacion and cancelacion.cancelado):
         print("ERROR: No se pudo obtener la transcripción.")
         return None, None
 
@@ -289,8 +407,9 @@ def traducir_y_sintetizar_audio(ruta_audio):
         sufijo_audio = "_sintetizado_es"
     else:
         print(f"INFO: Traduciendo de '{idioma_detectado}' a español.")
+        informar(0.75, "Traduciendo a español...")
         texto_final = traducir_texto(texto_original, idioma_origen=idioma_detectado, idioma_destino='es')
-        if not texto_final:
+        if not texto_final or (cancelacion and cancelacion.cancelado):
             return None, None
         
         ruta_transcripcion_final = os.path.join(CARPETA_TRANSCRIPCIONES, f"{nombre_base}_traduccion_es.txt")
@@ -300,11 +419,13 @@ def traducir_y_sintetizar_audio(ruta_audio):
         sufijo_audio = "_traducido_es"
 
     # 3. Sintetizar el texto final
+    informar(0.85, "Sintetizando audio...")
     ruta_audio_sintetizado = sintetizar_texto_a_audio(texto_final, nombre_base, sufijo=sufijo_audio)
     if not ruta_audio_sintetizado:
         return None, None
 
     print(f"SUCCESS: Proceso de audio completado.")
+    informar(1, "Proceso completado")
     return ruta_audio_sintetizado, ruta_transcripcion_final
 
 def sintetizar_texto_a_audio(texto, nombre_base, sufijo="_sintetizado", lang='es'):
@@ -314,7 +435,7 @@ def sintetizar_texto_a_audio(texto, nombre_base, sufijo="_sintetizado", lang='es
         ruta_salida_mp3 = os.path.join(CARPETA_AUDIO_SINTETIZADO, f"{nombre_base}{sufijo}.mp3")
 
         print(f"INFO: Sintetizando texto con gTTS...")
-        tts = gTTS(text=texto, lang=lang, slow=False)
+        tts = gTTSAgrupado(text=texto, lang=lang, slow=False)
         tts.save(ruta_salida_mp3)
         print(f"SUCCESS: Audio sintetizado guardado en '{ruta_salida_mp3}'")
         return ruta_salida_mp3
@@ -374,6 +495,9 @@ if __name__ == "__main__":
 
     crear_carpetas_necesarias()
 
+    # Import diferido: pipeline importa este módulo.
+    from pipeline import ARTEFACTOS, ARTEFACTOS_POR_DEFECTO, procesar
+
     parser = argparse.ArgumentParser(description="Extractor y transcriptor de audio desde YouTube o archivos locales.")
     
     group = parser.add_mutually_exclusive_group(required=True)
@@ -382,9 +506,35 @@ if __name__ == "__main__":
     group.add_argument('--sintetizar', type=str, help="Ruta a un archivo de transcripción (.txt) para sintetizar con gTTS.")
 
     parser.add_argument('--model-size', type=str, default="medium", help="Tamaño del modelo de Whisper a utilizar (pequeño, mediano, grande).")
+    parser.add_argument('--motor-asr', type=str, default=MOTOR_ASR_POR_DEFECTO, choices=MOTORES_ASR, help="Motor de transcripción a utilizar.")
+    parser.add_argument('--beam-size', type=int, default=None, help="Tamaño del beam search (por defecto, el del motor).")
+    parser.add_argument('--vad', action='store_true', help="Omitir los tramos sin voz antes de transcribir.")
+    parser.add_argument('--sin-checkpoint', action='store_true', help="No guardar ni reanudar checkpoints de transcripción.")
+    parser.add_argument('--pipeline', action='store_true', help="Con --url o --file: descargar, transcribir, traducir y sintetizar en memoria.")
+    parser.add_argument('--artefactos', type=str, nargs='+', default=ARTEFACTOS_POR_DEFECTO, choices=ARTEFACTOS, help="Con --pipeline: artefactos a guardar.")
+    parser.add_argument('--diarizar', action='store_true', help="Con --pipeline: identificar hablantes en la transcripción.")
+    parser.add_argument('--idioma-destino', type=str, default='es', help="Con --pipeline: idioma al que se traduce y sintetiza.")
+    parser.add_argument('--start', type=str, default=None, help="Con --pipeline: inicio del tramo a procesar (HH:MM:SS).")
+    parser.add_argument('--end', type=str, default=None, help="Con --pipeline: fin del tramo a procesar (HH:MM:SS).")
 
     args = parser.parse_args()
 
+    if args.pipeline:
+        if args.sintetizar:
+            parser.error("--pipeline requiere --url o --file.")
+        resultado, error_msg = procesar(
+            args.url or args.file, args.start, args.end, idioma_destino=args.idioma_destino,
+            model_size=args.model_size, motor_asr=args.motor_asr, beam_size=args.beam_size,
+            vad=args.vad, diarizar=args.diarizar, artefactos=args.artefactos
+        )
+        if error_msg:
+            print(f"ERROR: {error_msg}")
+            sys.exit(1)
+        for artefacto, ruta in resultado["artifacts"].items():
+            print(f"{artefacto}: {ruta}")
+        print("\n--- PROCESO COMPLETADO ---")
+        sys.exit(0)
+
     ruta_audio_final = None
     
     if args.url:
@@ -411,7 +561,7 @@ if __name__ == "__main__":
 
     if ruta_audio_final:
         print("--- INICIANDO TRANSCRIPCIÓN ---")
-        transcribir_y_diarizar(ruta_audio_final, model_size=args.model_size)
+        transcribir_y_diarizar(ruta_audio_final, model_size=args.model_size, motor_asr=args.motor_asr, beam_size=args.beam_size, vad=args.vad, reanudable=not args.sin_checkpoint)
     else:
         print("ERROR: No se pudo obtener un archivo de audio válido para procesar.")
         sys.exit(1)
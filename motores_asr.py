@@ -0,0 +1,443 @@
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+import torch
+import whisper
+from tqdm import tqdm
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se evita el uso simultáneo dentro del mismo proceso.
+    fcntl = None
+
+# --- CONFIGURACIÓN ---
+MOTORES_ASR = ['whisper', 'faster-whisper']
+MOTOR_ASR_POR_DEFECTO = 'whisper'
+BEAM_SIZE_POR_DEFECTO = 5
+# Versión fijada de silero-vad; torch.hub la descarga la primera vez y luego la usa desde su caché.
+REPOSITORIO_SILERO_VAD = 'snakers4/silero-vad:v5.1'
+VAD_RELLENO_MS = 200
+VAD_SILENCIO_MINIMO_MS = 1000
+MODELO_DETECCION_IDIOMA = 'base'
+SEGUNDOS_DETECCION_IDIOMA = 30
+# Tamaños con variante exclusiva para inglés ('.en'), más precisa cuando el idioma ya se conoce.
+MODELOS_CON_VARIANTE_EN = ['tiny', 'base', 'small', 'medium']
+# Los audios más largos que una ventana se transcriben por ventanas y se guarda un checkpoint tras cada una.
+SEGUNDOS_VENTANA_CHECKPOINT = 600
+SEGUNDOS_BUSQUEDA_CORTE = 5
+# faster-whisper entrega el texto a `al_transcribir_texto` en grupos de segmentos de al menos esta duración.
+SEGUNDOS_GRUPO_TEXTO = 30
+
+# --- UTILIDADES ---
+
+def obtener_dispositivo():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+@lru_cache(maxsize=4)
+def _cargar_whisper(model_size, device):
+    print(f"INFO: Cargando modelo de Whisper ({model_size}) en {device}...")
+    return whisper.load_model(model_size, device=device)
+
+@lru_cache(maxsize=None)
+def _candado_whisper(model_size, device):
+    """
+    Candado del modelo cacheado de openai-whisper. `transcribe` y `detect_language` instalan hooks
+    (kv-cache, atención cruzada) en el modelo compartido, así que dos hilos no pueden usarlo a la vez.
+    faster-whisper no lo necesita.
+    """
+    return threading.Lock()
+
+@lru_cache(maxsize=4)
+def _cargar_faster_whisper(model_size, device, compute_type):
+    print(f"INFO: Cargando modelo faster-whisper ({model_size}, {compute_type}) en {device}...")
+    return WhisperModel(model_size, device=device, compute_type=compute_type)
+
+@lru_cache(maxsize=1)
+def _cargar_silero_vad():
+    print("INFO: Cargando modelo VAD (silero-vad)...")
+    modelo, utils = torch.hub.load(REPOSITORIO_SILERO_VAD, 'silero_vad', trust_repo=True)
+    get_speech_timestamps = utils[0]
+    return modelo, get_speech_timestamps
+
+def _cargar_audio_inicial(ruta_audio, segundos):
+    """Decodifica solo los primeros `segundos` del archivo como audio mono a 16 kHz (float32)."""
+    comando = [
+        'ffmpeg', '-nostdin', '-threads', '0', '-i', ruta_audio, '-t', str(segundos),
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(whisper.audio.SAMPLE_RATE), '-'
+    ]
+    salida = subprocess.run(comando, capture_output=True, check=True).stdout
+    return np.frombuffer(salida, np.int16).flatten().astype(np.float32) / 32768.0
+
+# --- DETECCIÓN DE IDIOMA ---
+
+def detectar_idioma_audio(ruta_audio, model_size=MODELO_DETECCION_IDIOMA, top_k=5):
+    """
+    Detecta el idioma hablado usando solo la primera ventana de audio (30 s) y un modelo Whisper pequeño cacheado.
+    Devuelve (idioma, probabilidades) con las `top_k` probabilidades más altas, de mayor a menor.
+    """
+    return detectar_idioma_en_audio(_cargar_audio_inicial(ruta_audio, SEGUNDOS_DETECCION_IDIOMA), model_size, top_k)
+
+def detectar_idioma_en_audio(audio, model_size=MODELO_DETECCION_IDIOMA, top_k=5):
+    """Como `detectar_idioma_audio`, pero sobre un audio ya decodificado (mono, 16 kHz); usa sus primeros 30 s."""
+    device = obtener_dispositivo()
+    modelo = _cargar_whisper(model_size, device)
+    audio = whisper.pad_or_trim(audio[:SEGUNDOS_DETECCION_IDIOMA * whisper.audio.SAMPLE_RATE])
+    mel = whisper.log_mel_spectrogram(audio, n_mels=modelo.dims.n_mels).to(modelo.device)
+    with _candado_whisper(model_size, device):
+        _, probabilidades = modelo.detect_language(mel)
+
+    mejores = sorted(probabilidades.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return mejores[0][0], dict(mejores)
+
+def modelo_para_idioma(model_size, idioma):
+    """Elige la variante del modelo según el idioma conocido de antemano (p. ej. 'medium.en' para inglés)."""
+    if idioma == 'en' and model_size in MODELOS_CON_VARIANTE_EN:
+        return f"{model_size}.en"
+    return model_size
+
+# --- DETECCIÓN DE VOZ (VAD) ---
+
+def detectar_regiones_voz(audio):
+    """
+    Devuelve las regiones con voz de un audio mono a 16 kHz como lista de (inicio, fin) en muestras.
+    Los silencios más cortos que VAD_SILENCIO_MINIMO_MS no separan regiones.
+    """
+    modelo, get_speech_timestamps = _cargar_silero_vad()
+    regiones = get_speech_timestamps(
+        torch.from_numpy(audio),
+        modelo,
+        sampling_rate=whisper.audio.SAMPLE_RATE,
+        min_silence_duration_ms=VAD_SILENCIO_MINIMO_MS,
+        speech_pad_ms=VAD_RELLENO_MS,
+    )
+    return [(r['start'], r['end']) for r in regiones]
+
+def _remapear_tiempos(resultado, tramos):
+    """Traslada los tiempos de un resultado sobre el audio recortado a la línea de tiempo original."""
+    inicios_recortados = [inicio_recortado for inicio_recortado, _ in tramos]
+
+    def remapear(t):
+        i = max(bisect_right(inicios_recortados, t) - 1, 0)
+        inicio_recortado, inicio_original = tramos[i]
+        return inicio_original + (t - inicio_recortado)
+
+    for seg in resultado["segments"]:
+        seg["start"], seg["end"] = remapear(seg["start"]), remapear(seg["end"])
+        for w in seg.get("words", []):
+            w["start"] = remapear(w["start"])
+            w["end"] = max(remapear(w["end"]), w["start"])
+    return resultado
+
+# --- MOTORES ---
+
+def _transcribir_whisper(audio, model_size, beam_size, device, language, mostrar_progreso=True):
+    modelo = _cargar_whisper(model_size, device)
+    # verbose=False activa la barra tqdm de Whisper, que la interfaz de Gradio sigue como progreso real;
+    # verbose=None la desactiva.
+    opciones = {"word_timestamps": True, "fp16": device == "cuda", "language": language, "verbose": False if mostrar_progreso else None}
+    if beam_size:
+        opciones["beam_size"] = beam_size
+    with _candado_whisper(model_size, device):
+        return modelo.transcribe(audio, **opciones)
+
+def _transcribir_faster_whisper(audio, model_size, beam_size, device, compute_type, language, mostrar_progreso=True, al_transcribir_texto=None):
+    if WhisperModel is None:
+        raise RuntimeError("El motor 'faster-whisper' no está instalado. Ejecuta: pip install faster-whisper")
+
+    compute_type = compute_type or ("float16" if device == "cuda" else "int8")
+    modelo = _cargar_faster_whisper(model_size, device, compute_type)
+    segmentos, info = modelo.transcribe(audio, beam_size=beam_size or BEAM_SIZE_POR_DEFECTO, word_timestamps=True, language=language)
+
+    # Convertir al mismo formato que devuelve openai-whisper, informando el avance sobre la duración del audio.
+    # Los segmentos llegan de uno en uno, así que el texto se entrega por grupos mientras sigue la transcripción.
+    segments = []
+    grupo = []
+    with tqdm(total=round(info.duration, 2), unit="s", disable=not mostrar_progreso) as barra:
+        for i, seg in enumerate(segmentos):
+            barra.update(round(seg.end - barra.n, 2))
+            segments.append({
+                "id": i,
+                "start": seg.start,
+                "end": seg.end,
+                "text": seg.text,
+                "words": [
+                    {"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+                    for w in (seg.words or [])
+                ],
+            })
+            grupo.append(segments[-1])
+            if al_transcribir_texto and grupo[-1]["end"] - grupo[0]["start"] >= SEGUNDOS_GRUPO_TEXTO:
+                al_transcribir_texto("".join(seg["text"] for seg in grupo))
+                grupo = []
+    if al_transcribir_texto and grupo:
+        al_transcribir_texto("".join(seg["text"] for seg in grupo))
+
+    return {
+        "text": "".join(seg["text"] for seg in segments),
+        "segments": segments,
+        "language": info.language,
+    }
+
+def _transcribir_con_motor(audio, motor, model_size, beam_size, compute_type, language, mostrar_progreso=True, al_transcribir_texto=None):
+    """
+    Transcribe con el motor indicado. `al_transcribir_texto`, si se indica, recibe el texto en orden:
+    faster-whisper lo entrega por grupos de segmentos mientras transcribe; openai-whisper, todo al terminar.
+    """
+    device = obtener_dispositivo()
+    if motor == 'whisper':
+        resultado = _transcribir_whisper(audio, model_size, beam_size, device, language, mostrar_progreso)
+        if al_transcribir_texto:
+            al_transcribir_texto(resultado["text"])
+        return resultado
+    if motor == 'faster-whisper':
+        return _transcribir_faster_whisper(audio, model_size, beam_size, device, compute_type, language, mostrar_progreso, al_transcribir_texto)
+    raise ValueError(f"Motor ASR no soportado: '{motor}'. Opciones: {', '.join(MOTORES_ASR)}")
+
+# --- CHECKPOINTS ---
+
+class CheckpointEnUso(RuntimeError):
+    """Se lanza si otro trabajo ya está transcribiendo el mismo audio con los mismos parámetros."""
+
+
+_checkpoints_en_uso = set()
+_candado_checkpoints = threading.Lock()
+
+def _clave_checkpoint(audio, parametros):
+    """
+    Identifica el contenido del audio decodificado (número de muestras y hash del PCM) y los parámetros
+    de la transcripción. No depende de la ruta ni de la fecha del archivo, que cambian al volver a extraerlo.
+    """
+    huella = hashlib.sha1(memoryview(np.ascontiguousarray(audio))).hexdigest()
+    datos = [len(audio), huella, SEGUNDOS_VENTANA_CHECKPOINT, parametros]
+    return hashlib.sha1(json.dumps(datos, sort_keys=True).encode('utf-8')).hexdigest()
+
+@contextmanager
+def _bloquear_checkpoint(ruta_checkpoint):
+    """
+    Reserva el checkpoint para un solo trabajo mientras dura el bloque; lanza `CheckpointEnUso` si ya está reservado.
+    Dentro del proceso se usa un registro en memoria y, entre procesos, `flock` sobre un archivo '.lock' junto al checkpoint.
+    """
+    with _candado_checkpoints:
+        if ruta_checkpoint in _checkpoints_en_uso:
+            raise CheckpointEnUso(f"Ya hay un trabajo transcribiendo este audio ({ruta_checkpoint}).")
+        _checkpoints_en_uso.add(ruta_checkpoint)
+
+    ruta_candado = ruta_checkpoint + ".lock"
+    candado, bloqueado = None, False
+    try:
+        if fcntl:
+            candado = open(ruta_candado, 'a')
+            try:
+                fcntl.flock(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Si el dueño anterior borró el '.lock' entre nuestro open y el flock, el candado obtenido no sirve.
+                if os.fstat(candado.fileno()).st_ino != os.stat(ruta_candado).st_ino:
+                    raise BlockingIOError
+            except (BlockingIOError, FileNotFoundError):
+                raise CheckpointEnUso(f"Otro proceso está transcribiendo este audio ({ruta_checkpoint}).")
+            bloqueado = True
+        yield
+    finally:
+        if bloqueado:
+            os.remove(ruta_candado)
+        if candado:
+            candado.close()
+        with _candado_checkpoints:
+            _checkpoints_en_uso.discard(ruta_checkpoint)
+
+def _leer_checkpoint(ruta_checkpoint, clave):
+    """Devuelve las ventanas completadas de un checkpoint válido; ignora una última línea a medio escribir."""
+    if not os.path.exists(ruta_checkpoint):
+        return []
+    with open(ruta_checkpoint, 'r', encoding='utf-8') as f:
+        lineas = f.read().splitlines()
+    try:
+        if not lineas or json.loads(lineas[0]).get("clave") != clave:
+            return []
+    except json.JSONDecodeError:
+        return []
+
+    ventanas = []
+    for linea in lineas[1:]:
+        try:
+            ventanas.append(json.loads(linea))
+        except json.JSONDecodeError:
+            break
+    return ventanas
+
+def _reescribir_checkpoint(ruta_checkpoint, clave, ventanas):
+    """
+    Deja en el checkpoint solo la cabecera y las ventanas válidas. Se escribe en un archivo temporal
+    que reemplaza al original, así una interrupción nunca deja el checkpoint vacío o a medias.
+    """
+    ruta_temporal = ruta_checkpoint + ".tmp"
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"clave": clave}) + "\n")
+        for ventana in ventanas:
+            f.write(json.dumps(ventana) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta_temporal, ruta_checkpoint)
+
+def _punto_de_corte(audio, objetivo):
+    """Busca el tramo de 0.1 s más silencioso en los segundos previos a `objetivo` para no cortar palabras."""
+    if objetivo >= len(audio):
+        return len(audio)
+    sr = whisper.audio.SAMPLE_RATE
+    trama = sr // 10
+    inicio = max(objetivo - SEGUNDOS_BUSQUEDA_CORTE * sr, 0)
+    n_tramas = (objetivo - inicio) // trama
+    if n_tramas == 0:
+        return objetivo
+    energia = np.square(audio[inicio:inicio + n_tramas * trama].reshape(n_tramas, trama)).mean(axis=1)
+    return inicio + int(np.argmin(energia)) * trama + trama // 2
+
+def _transcribir_por_ventanas(audio, ruta_checkpoint, clave, motor, model_size, beam_size, compute_type, language, cancelacion, al_transcribir_texto, progreso=None):
+    """
+    Transcribe el audio por ventanas, comprobando la cancelación entre una y otra.
+    `al_transcribir_texto`, si se indica, recibe el texto en orden (también el de las ventanas recuperadas del checkpoint).
+    `progreso(fraccion, descripcion)`, si se indica, recibe el avance sobre el audio completo tras cada ventana
+    y sustituye a las barras tqdm de cada ventana, que volverían a empezar de cero en cada una.
+    Con `ruta_checkpoint`, añade cada ventana completada al checkpoint (JSONL) y, si ya tiene ventanas
+    para la misma clave, continúa desde la última posición guardada.
+    """
+    sr = whisper.audio.SAMPLE_RATE
+    ventanas = _leer_checkpoint(ruta_checkpoint, clave) if ruta_checkpoint else []
+    segments = [seg for ventana in ventanas for seg in ventana["segments"]]
+    language = language or next((v["language"] for v in ventanas if v.get("language")), None)
+    inicio = ventanas[-1]["fin"] if ventanas else 0
+    if al_transcribir_texto:
+        for ventana in ventanas:
+            al_transcribir_texto("".join(seg["text"] for seg in ventana["segments"]))
+    if inicio:
+        print(f"INFO: Reanudando transcripción desde el checkpoint ({inicio / sr:.1f}s de {len(audio) / sr:.1f}s).")
+
+    def informar():
+        if progreso:
+            progreso(inicio / len(audio), f"Transcribiendo ({inicio / sr:.0f}s de {len(audio) / sr:.0f}s)...")
+    informar()
+
+    if ruta_checkpoint:
+        _reescribir_checkpoint(ruta_checkpoint, clave, ventanas)
+    f = open(ruta_checkpoint, 'a', encoding='utf-8') if ruta_checkpoint else None
+    try:
+        while inicio < len(audio):
+            if cancelacion:
+                cancelacion.verificar()
+            fin = _punto_de_corte(audio, inicio + SEGUNDOS_VENTANA_CHECKPOINT * sr)
+            resultado = _transcribir_con_motor(audio[inicio:fin], motor, model_size, beam_size, compute_type, language,
+                                               mostrar_progreso=not progreso, al_transcribir_texto=al_transcribir_texto)
+            # Fijar el idioma de la primera ventana para el resto del audio.
+            language = language or resultado.get("language")
+
+            desplazamiento = inicio / sr
+            for seg in resultado["segments"]:
+                seg["start"] += desplazamiento
+                seg["end"] += desplazamiento
+                for w in seg.get("words", []):
+                    w["start"] += desplazamiento
+                    w["end"] += desplazamiento
+            segments.extend(resultado["segments"])
+
+            if f:
+                f.write(json.dumps({"fin": fin, "language": language, "segments": resultado["segments"]}, default=float) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            inicio = fin
+            informar()
+    finally:
+        if f:
+            f.close()
+
+    return {"text": "".join(seg["text"] for seg in segments), "segments": segments, "language": language}
+
+def transcribir(ruta_audio, motor=MOTOR_ASR_POR_DEFECTO, model_size="medium", beam_size=None, compute_type=None, vad=False, language=None, carpeta_checkpoints=None, cancelacion=None, al_transcribir_texto=None, progreso=None):
+    """
+    Transcribe un archivo de audio (o un audio ya decodificado como array mono a 16 kHz) con el motor ASR indicado.
+    Devuelve un diccionario con el formato de openai-whisper: 'text', 'segments' (con 'words') y 'language'.
+    Los modelos se cachean por motor, tamaño y dispositivo.
+
+    Con `vad=True` solo se envían al motor las regiones con voz y los tiempos se remapean al audio original;
+    el resultado incluye además 'vad' con la duración total, la omitida y la fracción omitida.
+    Si se indica `language`, el motor no vuelve a detectar el idioma.
+
+    Con `carpeta_checkpoints`, los audios largos se transcriben por ventanas guardando el avance en esa carpeta;
+    una nueva llamada con el mismo audio y parámetros continúa donde quedó. La ruta del checkpoint se devuelve
+    en 'checkpoint' para que el llamador lo elimine cuando ya no lo necesite.
+    Con `cancelacion` (un `TokenCancelacion`), los audios largos también se procesan por ventanas
+    y la cancelación se comprueba entre ellas, lanzando `OperacionCancelada`.
+    `al_transcribir_texto(texto)` recibe el texto en cuanto se transcribe (con faster-whisper, por grupos de
+    segmentos de SEGUNDOS_GRUPO_TEXTO; con openai-whisper, por ventana), para que las etapas
+    siguientes empiecen antes de terminar el audio completo. Los checkpoints solo se usan con rutas de archivo.
+    `progreso(fraccion, descripcion)` recibe el avance de los audios que se transcriben por ventanas;
+    los más cortos informan con la barra tqdm del motor.
+    """
+    if not vad and not carpeta_checkpoints and not cancelacion and not al_transcribir_texto:
+        return _transcribir_con_motor(ruta_audio, motor, model_size, beam_size, compute_type, language)
+
+    if isinstance(ruta_audio, np.ndarray):
+        audio, carpeta_checkpoints = ruta_audio, None
+    else:
+        audio = whisper.load_audio(ruta_audio)
+    sr = whisper.audio.SAMPLE_RATE
+    if not vad:
+        return _transcribir_audio(ruta_audio, audio, motor, model_size, beam_size, compute_type, vad, language, carpeta_checkpoints, cancelacion, al_transcribir_texto, progreso)
+
+    regiones = detectar_regiones_voz(audio)
+
+    # Concatenar las regiones con voz y recordar dónde empieza cada una en ambas líneas de tiempo.
+    tramos = []
+    muestras_recortadas = 0
+    for inicio, fin in regiones:
+        tramos.append((muestras_recortadas / sr, inicio / sr))
+        muestras_recortadas += fin - inicio
+
+    duracion_total = len(audio) / sr
+    duracion_omitida = duracion_total - muestras_recortadas / sr
+    metricas_vad = {
+        "duracion_total": duracion_total,
+        "duracion_omitida": duracion_omitida,
+        "fraccion_omitida": duracion_omitida / duracion_total if duracion_total else 0.0,
+    }
+
+    if not regiones:
+        return {"text": "", "segments": [], "language": "unknown", "vad": metricas_vad}
+
+    audio_voz = np.concatenate([audio[inicio:fin] for inicio, fin in regiones])
+    del audio
+    resultado = _transcribir_audio(ruta_audio, audio_voz, motor, model_size, beam_size, compute_type, vad, language, carpeta_checkpoints, cancelacion, al_transcribir_texto, progreso)
+    resultado = _remapear_tiempos(resultado, tramos)
+    resultado["vad"] = metricas_vad
+    return resultado
+
+def _transcribir_audio(ruta_audio, audio, motor, model_size, beam_size, compute_type, vad, language, carpeta_checkpoints, cancelacion, al_transcribir_texto, progreso):
+    """Transcribe un audio ya decodificado, por ventanas (con checkpoint si se pide) si es más largo que una ventana."""
+    if cancelacion:
+        cancelacion.verificar()
+    if len(audio) <= SEGUNDOS_VENTANA_CHECKPOINT * whisper.audio.SAMPLE_RATE:
+        return _transcribir_con_motor(audio, motor, model_size, beam_size, compute_type, language, al_transcribir_texto=al_transcribir_texto)
+    if not carpeta_checkpoints:
+        return _transcribir_por_ventanas(audio, None, None, motor, model_size, beam_size, compute_type, language, cancelacion, al_transcribir_texto, progreso)
+
+    parametros = {"motor": motor, "model_size": model_size, "beam_size": beam_size,
+                  "compute_type": compute_type, "vad": vad, "language": language}
+    clave = _clave_checkpoint(audio, parametros)
+    os.makedirs(carpeta_checkpoints, exist_ok=True)
+    nombre_base = os.path.splitext(os.path.basename(ruta_audio))[0]
+    ruta_checkpoint = os.path.join(carpeta_checkpoints, f"{nombre_base}_{clave[:12]}.jsonl")
+
+    with _bloquear_checkpoint(ruta_checkpoint):
+        resultado = _transcribir_por_ventanas(audio, ruta_checkpoint, clave, motor, model_size, beam_size, compute_type, language, cancelacion, al_transcribir_texto, progreso)
+    resultado["checkpoint"] = ruta_checkpoint
+    return resultado
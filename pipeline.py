@@ -0,0 +1,288 @@
+import os
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import torch
+import whisper
+
+from clientes_http import gTTSAgrupado
+from extractor import (
+    CARPETA_AUDIOS,
+    CARPETA_AUDIO_SINTETIZADO,
+    CARPETA_TRANSCRIPCIONES,
+    HUGGING_FACE_TOKEN,
+    PLAZO_DESCARGA,
+    PLAZO_EXTRACCION,
+    PLAZO_TRANSCRIPCION,
+    UMBRAL_CONFIANZA_IDIOMA,
+    descargar_video_youtube,
+    diarizar_audio,
+    escribir_transcripcion_con_hablantes,
+    iterar_palabras,
+    iterar_segmentos_con_hablantes,
+    limpiar_nombre_archivo,
+    traducir_texto,
+)
+from motores_asr import MOTOR_ASR_POR_DEFECTO, detectar_idioma_en_audio, modelo_para_idioma, transcribir
+from trabajos import OperacionCancelada, ejecutar_comando, iniciar_proceso, terminar_proceso, token_de_etapa
+
+# --- CONFIGURACIÓN ---
+# Artefactos que el pipeline puede guardar en disco; el resto de datos solo vive en memoria.
+# 'video' solo existe para URLs; 'audio' es el audio decodificado para la transcripción (WAV mono a 16 kHz).
+ARTEFACTOS = ['video', 'audio', 'transcript', 'translation', 'synthesized_audio']
+ARTEFACTOS_POR_DEFECTO = ['synthesized_audio']
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE
+
+# --- DECODIFICACIÓN EN MEMORIA ---
+
+def _comando_ffmpeg_pcm(entrada, start_time=None, end_time=None):
+    """Comando de ffmpeg que decodifica `entrada` a PCM mono de 16 bits a 16 kHz por stdout."""
+    comando = ['ffmpeg', '-nostdin', '-threads', '0', '-i', entrada]
+    if start_time and end_time:
+        comando += ['-ss', start_time, '-to', end_time]
+    return comando + ['-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-']
+
+def _pcm_a_forma_de_onda(datos):
+    return np.frombuffer(datos, np.int16).astype(np.float32) / 32768.0
+
+def decodificar_audio(ruta, cancelacion=None):
+    """Decodifica un archivo local a una forma de onda en memoria (float32, mono, 16 kHz)."""
+    return _pcm_a_forma_de_onda(ejecutar_comando(_comando_ffmpeg_pcm(ruta), cancelacion=cancelacion).stdout)
+
+def descargar_audio_en_memoria(url, start_time=None, end_time=None, cancelacion=None):
+    """
+    Descarga solo la pista de audio con yt-dlp y la decodifica con ffmpeg a través de una tubería,
+    sin escribir archivos intermedios. Devuelve la forma de onda (float32, mono, 16 kHz).
+    Con `start_time` y `end_time`, yt-dlp descarga solo ese tramo (`--download-sections`).
+    Lanza `subprocess.CalledProcessError` si yt-dlp termina con error, aunque ya hubiera enviado parte del audio.
+    """
+    comando_descarga = ['yt-dlp', '-f', 'bestaudio/best', '--quiet', '--no-warnings', '-o', '-']
+    if start_time and end_time:
+        comando_descarga += ['--download-sections', f'*{start_time}-{end_time}']
+    comando_descarga.append(url)
+
+    descarga = iniciar_proceso(comando_descarga, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        salida = ejecutar_comando(_comando_ffmpeg_pcm('pipe:0'), cancelacion=cancelacion, stdin=descarga.stdout).stdout
+    except BaseException:
+        terminar_proceso(descarga)
+        raise
+    finally:
+        descarga.stdout.close()
+        _, error_descarga = descarga.communicate()
+
+    error_descarga = error_descarga.decode('utf-8', errors='replace').strip()
+    if descarga.returncode:
+        raise subprocess.CalledProcessError(descarga.returncode, comando_descarga, stderr=error_descarga)
+    if not salida:
+        raise RuntimeError(f"yt-dlp no devolvió audio: {error_descarga}")
+    return _pcm_a_forma_de_onda(salida)
+
+def obtener_nombre_base(url, cancelacion=None):
+    resultado = ejecutar_comando(['yt-dlp', '--get-filename', '-o', '%(title)s', url], cancelacion=cancelacion, text=True, encoding='utf-8')
+    return limpiar_nombre_archivo(resultado.stdout.strip()) or "youtube"
+
+# --- ARTEFACTOS ---
+
+def guardar_wav(forma_de_onda, ruta):
+    with wave.open(ruta, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(forma_de_onda, -1, 1) * 32767).astype(np.int16).tobytes())
+
+def sintetizar_en_memoria(texto, lang):
+    """Sintetiza con gTTS y devuelve los bytes MP3 sin escribirlos en disco."""
+    if not texto.strip():
+        return b""
+    return b"".join(gTTSAgrupado(text=texto, lang=lang, slow=False).stream())
+
+# --- PIPELINE ---
+
+class _Cronometro:
+    """Acumula segundos por etapa; las etapas que corren en hilos suman su tiempo de trabajo."""
+
+    def __init__(self):
+        self.tiempos = {}
+        self._candado = threading.Lock()
+
+    def medir(self, etapa, funcion, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            with self._candado:
+                self.tiempos[etapa] = self.tiempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+def procesar(fuente, start_time=None, end_time=None, idioma_destino='es', model_size="medium",
+             motor_asr=MOTOR_ASR_POR_DEFECTO, beam_size=None, vad=False, diarizar=False,
+             artefactos=ARTEFACTOS_POR_DEFECTO, cancelacion=None):
+    """
+    Ejecuta descarga → detección de idioma → transcripción → traducción → síntesis como un solo flujo en memoria.
+    `fuente` es una URL de YouTube o la ruta de un archivo local de audio/video.
+
+    La traducción y la síntesis empiezan mientras sigue la transcripción: con faster-whisper, por grupos de
+    segmentos de unos SEGUNDOS_GRUPO_TEXTO; con openai-whisper, por ventanas de SEGUNDOS_VENTANA_CHECKPOINT
+    (10 minutos), así que con ese motor un audio más corto se traduce cuando termina de transcribirse.
+    La diarización (opcional) corre en paralelo con la transcripción. Solo se escriben en disco los `artefactos`
+    pedidos; 'audio' se guarda como WAV mono a 16 kHz (el audio que se transcribe), no como el MP3 de `extraer_audio`.
+    Devuelve una tupla (resultado, mensaje_de_error); el resultado incluye el idioma, las rutas guardadas
+    y los segundos por etapa.
+    """
+    artefactos_invalidos = set(artefactos) - set(ARTEFACTOS)
+    if artefactos_invalidos:
+        return None, f"Artefactos no soportados: {', '.join(sorted(artefactos_invalidos))}. Opciones: {', '.join(ARTEFACTOS)}"
+    if bool(start_time) != bool(end_time):
+        return None, "Debes especificar tanto el tiempo de inicio como el de fin para cortar el audio."
+    if start_time:
+        try:
+            datetime.strptime(start_time, '%H:%M:%S')
+            datetime.strptime(end_time, '%H:%M:%S')
+        except ValueError:
+            return None, "Formato de tiempo inválido. Usa HH:MM:SS."
+    if diarizar and not HUGGING_FACE_TOKEN:
+        return None, "El token de Hugging Face no está configurado para la diarización."
+
+    es_url = fuente.startswith(('http://', 'https://'))
+    if not es_url and not os.path.exists(fuente):
+        return None, f"El archivo '{fuente}' no fue encontrado."
+    if not es_url and 'video' in artefactos:
+        return None, "El artefacto 'video' solo está disponible cuando la fuente es una URL."
+
+    cronometro = _Cronometro()
+    inicio_total = time.perf_counter()
+    guardados = {}
+    print(f"--- INICIANDO PIPELINE PARA: {fuente} ---")
+
+    try:
+        # 1. Obtener la forma de onda en memoria
+        if es_url and 'video' in artefactos:
+            # El video se pidió como artefacto: se descarga a disco y se decodifica desde ahí.
+            ruta_video, error_msg = cronometro.medir('descarga', descargar_video_youtube, fuente, start_time, end_time, cancelacion=cancelacion)
+            if error_msg:
+                return None, error_msg
+            guardados['video'] = ruta_video
+            nombre_base = os.path.splitext(os.path.basename(ruta_video))[0]
+            audio = cronometro.medir('decodificacion', decodificar_audio, ruta_video, token_de_etapa(cancelacion, PLAZO_EXTRACCION))
+        elif es_url:
+            token_descarga = token_de_etapa(cancelacion, PLAZO_DESCARGA)
+            nombre_base = obtener_nombre_base(fuente, token_descarga)
+            audio = cronometro.medir('descarga', descargar_audio_en_memoria, fuente, start_time, end_time, token_descarga)
+        else:
+            nombre_base = limpiar_nombre_archivo(os.path.splitext(os.path.basename(fuente))[0])
+            token_extraccion = token_de_etapa(cancelacion, PLAZO_EXTRACCION)
+            comando = _comando_ffmpeg_pcm(fuente, start_time, end_time)
+            audio = cronometro.medir('decodificacion', lambda: _pcm_a_forma_de_onda(ejecutar_comando(comando, cancelacion=token_extraccion).stdout))
+        print(f"INFO: Audio en memoria: {len(audio) / SAMPLE_RATE:.1f}s")
+
+        if 'audio' in artefactos:
+            os.makedirs(CARPETA_AUDIOS, exist_ok=True)
+            guardados['audio'] = os.path.join(CARPETA_AUDIOS, f"{nombre_base}_16k.wav")
+            guardar_wav(audio, guardados['audio'])
+
+        # 2. Detectar el idioma con la primera ventana para fijar modelo e idioma de la transcripción
+        idioma, probabilidades = cronometro.medir('deteccion_idioma', detectar_idioma_en_audio, audio)
+        print(f"INFO: Idioma detectado en la primera ventana: {idioma} ({probabilidades[idioma]:.0%})")
+        idioma_fijado = idioma if probabilidades[idioma] >= UMBRAL_CONFIANZA_IDIOMA else None
+
+        # 3. Transcribir; cada ventana se encola para traducción y síntesis mientras sigue la transcripción
+        token_transcripcion = token_de_etapa(cancelacion, PLAZO_TRANSCRIPCION)
+        idioma_origen = {"valor": idioma_fijado}
+        traducciones, sintesis = [], []
+        with ThreadPoolExecutor(max_workers=1) as hilo_diarizacion, \
+             ThreadPoolExecutor(max_workers=1) as hilo_traduccion, \
+             ThreadPoolExecutor(max_workers=1) as hilo_sintesis:
+
+            futuro_diarizacion = None
+            if diarizar:
+                forma_de_onda = {"waveform": torch.from_numpy(audio).unsqueeze(0), "sample_rate": SAMPLE_RATE}
+                futuro_diarizacion = hilo_diarizacion.submit(cronometro.medir, 'diarizacion', diarizar_audio, forma_de_onda, token_transcripcion)
+
+            def traducir_ventana(texto):
+                token_transcripcion.verificar()
+                texto = texto.strip()
+                if not texto or idioma_origen["valor"] == idioma_destino:
+                    return texto
+                traducido = traducir_texto(texto, idioma_origen=idioma_origen["valor"] or 'auto', idioma_destino=idioma_destino)
+                if traducido is None:
+                    raise RuntimeError("La traducción falló.")
+                return traducido
+
+            def sintetizar_ventana(futuro_traduccion):
+                texto = futuro_traduccion.result()
+                token_transcripcion.verificar()
+                return cronometro.medir('sintesis', sintetizar_en_memoria, texto, idioma_destino)
+
+            def al_transcribir_texto(texto):
+                futuro = hilo_traduccion.submit(cronometro.medir, 'traduccion', traducir_ventana, texto)
+                traducciones.append(futuro)
+                if 'synthesized_audio' in artefactos:
+                    sintesis.append(hilo_sintesis.submit(sintetizar_ventana, futuro))
+
+            try:
+                resultado_asr = cronometro.medir(
+                    'transcripcion', transcribir, audio,
+                    motor=motor_asr, model_size=modelo_para_idioma(model_size, idioma_fijado), beam_size=beam_size,
+                    vad=vad, language=idioma_fijado, cancelacion=token_transcripcion,
+                    al_transcribir_texto=al_transcribir_texto
+                )
+                idioma_origen["valor"] = idioma_origen["valor"] or resultado_asr.get("language")
+                diarizacion = futuro_diarizacion.result() if futuro_diarizacion else None
+                texto_traducido = " ".join(t for t in (f.result() for f in traducciones) if t)
+                audio_sintetizado = b"".join(f.result() for f in sintesis)
+            except BaseException:
+                # Detener las etapas pendientes antes de salir de los ejecutores.
+                token_transcripcion.cancelar("error en otra etapa")
+                raise
+
+        idioma_final = resultado_asr.get("language") or idioma
+        if vad:
+            print(f"INFO: VAD omitió {resultado_asr['vad']['fraccion_omitida']:.1%} del audio.")
+
+        # 4. Guardar solo los artefactos pedidos
+        if 'transcript' in artefactos:
+            os.makedirs(CARPETA_TRANSCRIPCIONES, exist_ok=True)
+            guardados['transcript'] = os.path.join(CARPETA_TRANSCRIPCIONES, f"{nombre_base}_transcripcion.txt")
+            with open(guardados['transcript'], "w", encoding='utf-8') as f:
+                if diarizacion:
+                    escribir_transcripcion_con_hablantes(iterar_segmentos_con_hablantes(diarizacion, iterar_palabras(resultado_asr["segments"])), f)
+                else:
+                    f.write(resultado_asr["text"])
+        if 'translation' in artefactos:
+            os.makedirs(CARPETA_TRANSCRIPCIONES, exist_ok=True)
+            guardados['translation'] = os.path.join(CARPETA_TRANSCRIPCIONES, f"{nombre_base}_traduccion_{idioma_destino}.txt")
+            with open(guardados['translation'], "w", encoding='utf-8') as f:
+                f.write(texto_traducido)
+        if 'synthesized_audio' in artefactos:
+            os.makedirs(CARPETA_AUDIO_SINTETIZADO, exist_ok=True)
+            guardados['synthesized_audio'] = os.path.join(CARPETA_AUDIO_SINTETIZADO, f"{nombre_base}_traducido_{idioma_destino}.mp3")
+            with open(guardados['synthesized_audio'], "wb") as f:
+                f.write(audio_sintetizado)
+
+    except OperacionCancelada as e:
+        print(f"ERROR: Pipeline cancelado ({e}).")
+        return None, f"Pipeline cancelado ({e})."
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode('utf-8', errors='replace') if isinstance(e.stderr, bytes) else e.stderr
+        error_msg = f"Falló un proceso externo ({e.cmd[0]}): {stderr}"
+        print(f"ERROR: {error_msg}")
+        return None, error_msg
+    except Exception as e:
+        print(f"ERROR durante el pipeline: {e}")
+        import traceback
+        traceback.print_exc()
+        return None, f"Ocurrió un error inesperado durante el pipeline: {e}"
+
+    cronometro.tiempos['total'] = time.perf_counter() - inicio_total
+    print("SUCCESS: Pipeline completado. Tiempos por etapa: " + ", ".join(f"{k}={v:.1f}s" for k, v in cronometro.tiempos.items()))
+    return {
+        "language": idioma_final,
+        "vad": resultado_asr.get("vad"),
+        "artifacts": guardados,
+        "timings": {etapa: round(segundos, 3) for etapa, segundos in cronometro.tiempos.items()},
+    }, None
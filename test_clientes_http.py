@@ -0,0 +1,147 @@
+"""
+Pruebas de clientes_http contra un servidor HTTP local que inyecta latencia y fallos.
+
+Uso:
+    python -m pytest -q test_clientes_http.py
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+
+import clientes_http
+
+
+class ServidorDePrueba:
+    """Responde en orden con los (código, cabeceras) de `respuestas`; después, 200 con eco del texto en mayúsculas."""
+
+    def __init__(self):
+        self.respuestas = []
+        self.latencia = 0.0
+        self.peticiones = 0
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.textos = []
+        self._candado = threading.Lock()
+
+    def atender(self, manejador):
+        with self._candado:
+            self.peticiones += 1
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+            codigo, cabeceras = self.respuestas.pop(0) if self.respuestas else (200, {})
+        try:
+            if self.latencia:
+                time.sleep(self.latencia)
+            longitud = int(manejador.headers.get('Content-Length', 0))
+            texto = parse_qs(manejador.rfile.read(longitud).decode('utf-8')).get('q', [''])[0]
+            self.textos.append(texto)
+            cuerpo = json.dumps([[[texto.upper(), texto]], None, 'en']).encode('utf-8')
+            manejador.send_response(codigo)
+            for nombre, valor in cabeceras.items():
+                manejador.send_header(nombre, valor)
+            manejador.send_header('Content-Type', 'application/json')
+            manejador.send_header('Content-Length', str(len(cuerpo)))
+            manejador.end_headers()
+            manejador.wfile.write(cuerpo)
+        finally:
+            with self._candado:
+                self.en_curso -= 1
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    estado = ServidorDePrueba()
+
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            estado.atender(self)
+
+        def log_message(self, *args):
+            pass
+
+    http = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+    hilo = threading.Thread(target=http.serve_forever, daemon=True)
+    hilo.start()
+    estado.url = f"http://127.0.0.1:{http.server_address[1]}/translate_a/single"
+
+    monkeypatch.setattr(clientes_http, 'URL_TRADUCCION', estado.url)
+    monkeypatch.setattr(clientes_http, '_semaforos_por_host', {})
+    yield estado
+    http.shutdown()
+    http.server_close()
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Registra las esperas entre reintentos sin dormir realmente."""
+    registro = []
+    monkeypatch.setattr(clientes_http, '_esperar', registro.append)
+    return registro
+
+
+def test_reintenta_503_y_429(servidor, esperas):
+    servidor.respuestas = [(503, {}), (429, {})]
+    respuesta = clientes_http.solicitar('POST', servidor.url, data={'q': 'hola'})
+    assert respuesta.status_code == 200
+    assert servidor.peticiones == 3
+    assert len(esperas) == 2
+
+
+def test_respeta_retry_after(servidor, esperas):
+    servidor.respuestas = [(429, {'Retry-After': '3'})]
+    clientes_http.solicitar('POST', servidor.url, data={'q': 'hola'})
+    assert esperas == [3.0]
+
+
+def test_retry_after_se_limita_a_la_espera_maxima(servidor, esperas):
+    servidor.respuestas = [(503, {'Retry-After': '3600'})]
+    clientes_http.solicitar('POST', servidor.url, data={'q': 'hola'})
+    assert esperas == [clientes_http.ESPERA_MAXIMA_SEGUNDOS]
+
+
+def test_se_rinde_tras_max_reintentos(servidor, esperas):
+    servidor.respuestas = [(503, {})] * (clientes_http.MAX_REINTENTOS + 5)
+    with pytest.raises(requests.HTTPError):
+        clientes_http.solicitar('POST', servidor.url, data={'q': 'hola'})
+    assert servidor.peticiones == clientes_http.MAX_REINTENTOS + 1
+    assert len(esperas) == clientes_http.MAX_REINTENTOS
+
+
+def test_no_reintenta_errores_del_cliente(servidor, esperas):
+    servidor.respuestas = [(404, {})]
+    with pytest.raises(requests.HTTPError):
+        clientes_http.solicitar('POST', servidor.url, data={'q': 'hola'})
+    assert servidor.peticiones == 1
+    assert esperas == []
+
+
+def test_limita_conexiones_por_host_con_latencia(servidor, monkeypatch):
+    monkeypatch.setattr(clientes_http, 'LIMITE_CONEXIONES_POR_HOST', 2)
+    servidor.latencia = 0.2
+    hilos = [threading.Thread(target=clientes_http.solicitar, args=('POST', servidor.url), kwargs={'data': {'q': 'hola'}})
+             for _ in range(6)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert servidor.peticiones == 6
+    assert servidor.max_en_curso == 2
+
+
+def test_traducir_divide_y_conserva_separadores(servidor, monkeypatch):
+    monkeypatch.setattr(clientes_http, 'LIMITE_CARACTERES_TRADUCCION', 10)
+    texto = "uno dos\ntres cuatro\n\ncinco"
+    assert clientes_http.traducir(texto, 'es', 'en') == texto.upper()
+    assert all(t == t.lstrip() for t in servidor.textos)
+
+
+def test_traducir_no_duplica_saltos_de_linea(servidor):
+    texto = "\n" * 500 + "hola"
+    assert clientes_http.traducir(texto, 'es', 'en') == "\n" * 500 + "HOLA"
@@ -0,0 +1,210 @@
+"""
+Pruebas de motores_asr con modelos y motores falsos (no descargan ni ejecutan modelos reales).
+
+Uso:
+    python -m pytest -q test_motores_asr.py
+"""
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("whisper")
+
+import motores_asr
+
+SR = 16000
+
+
+class ModeloWhisperFalso:
+    """Imita `transcribe` de openai-whisper y registra cuántas llamadas se solapan."""
+
+    def __init__(self):
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self._candado = threading.Lock()
+
+    def transcribe(self, audio, **opciones):
+        with self._candado:
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        time.sleep(0.2)
+        with self._candado:
+            self.en_curso -= 1
+        return {"text": " x", "segments": [], "language": "es"}
+
+
+def test_transcripciones_simultaneas_con_el_mismo_modelo_se_serializan(monkeypatch):
+    modelo = ModeloWhisperFalso()
+    monkeypatch.setattr(motores_asr, '_cargar_whisper', lambda model_size, device: modelo)
+    audio = np.zeros(SR, dtype=np.float32)
+
+    hilos = [threading.Thread(target=motores_asr.transcribir, args=(audio,), kwargs={"model_size": "base"}) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert modelo.max_en_curso == 1
+
+
+# --- Checkpoints ---
+
+class MotorFalso:
+    """Sustituye a `_transcribir_con_motor`: un segmento por ventana con la longitud de la ventana como texto."""
+
+    def __init__(self, fallar_en=None, al_llamar=None):
+        self.llamadas = 0
+        self.fallar_en = fallar_en
+        self.al_llamar = al_llamar
+
+    def __call__(self, audio, motor, model_size, beam_size, compute_type, language, mostrar_progreso=True, al_transcribir_texto=None):
+        self.llamadas += 1
+        if self.llamadas == self.fallar_en:
+            raise RuntimeError("caída simulada")
+        if self.al_llamar:
+            self.al_llamar()
+        duracion = len(audio) / SR
+        return {"text": f" {len(audio)}", "segments": [{"start": 0.0, "end": duracion, "text": f" {len(audio)}", "words": []}], "language": "es"}
+
+
+@pytest.fixture
+def audio(monkeypatch):
+    """Audio de 9 s con ventanas de 2 s, para que un audio corto tenga varias ventanas."""
+    monkeypatch.setattr(motores_asr, 'SEGUNDOS_VENTANA_CHECKPOINT', 2)
+    monkeypatch.setattr(motores_asr, 'SEGUNDOS_BUSQUEDA_CORTE', 1)
+    datos = np.random.default_rng(0).normal(0, 0.1, 9 * SR).astype(np.float32)
+    monkeypatch.setattr(motores_asr.whisper, 'load_audio', lambda ruta: datos)
+    return datos
+
+
+def transcribir_con_checkpoint(carpeta, motor, monkeypatch):
+    monkeypatch.setattr(motores_asr, '_transcribir_con_motor', motor)
+    return motores_asr.transcribir("audio.mp3", carpeta_checkpoints=str(carpeta))
+
+
+def interrumpir(carpeta, monkeypatch, ventanas_completadas=2):
+    """Transcribe hasta que falla la ventana siguiente a `ventanas_completadas`; devuelve la ruta del checkpoint."""
+    with pytest.raises(RuntimeError):
+        transcribir_con_checkpoint(carpeta, MotorFalso(fallar_en=ventanas_completadas + 1), monkeypatch)
+    (ruta,) = carpeta.glob("*.jsonl")
+    return ruta
+
+
+def referencia(tmp_path, monkeypatch):
+    motor = MotorFalso()
+    resultado = transcribir_con_checkpoint(tmp_path / "referencia", motor, monkeypatch)
+    return resultado, motor.llamadas
+
+
+def test_reanuda_desde_el_ultimo_fin(tmp_path, audio, monkeypatch):
+    esperado, ventanas = referencia(tmp_path, monkeypatch)
+    ruta = interrumpir(tmp_path / "ck", monkeypatch)
+    guardadas = [json.loads(linea) for linea in ruta.read_text().splitlines()[1:]]
+    assert len(guardadas) == 2
+
+    motor = MotorFalso()
+    resultado = transcribir_con_checkpoint(tmp_path / "ck", motor, monkeypatch)
+    assert motor.llamadas == ventanas - 2
+    assert resultado["text"] == esperado["text"]
+    assert [s["start"] for s in resultado["segments"]] == [s["start"] for s in esperado["segments"]]
+    assert resultado["segments"][2]["start"] == guardadas[-1]["fin"] / SR
+
+
+def test_ignora_la_ultima_linea_a_medio_escribir(tmp_path, audio, monkeypatch):
+    esperado, ventanas = referencia(tmp_path, monkeypatch)
+    ruta = interrumpir(tmp_path / "ck", monkeypatch)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.write('{"fin": 4800')
+
+    motor = MotorFalso()
+    resultado = transcribir_con_checkpoint(tmp_path / "ck", motor, monkeypatch)
+    assert motor.llamadas == ventanas - 2
+    assert resultado["text"] == esperado["text"]
+
+
+def test_clave_distinta_empieza_de_cero(tmp_path, audio, monkeypatch):
+    _, ventanas = referencia(tmp_path, monkeypatch)
+    ruta = interrumpir(tmp_path / "ck", monkeypatch)
+    lineas = ruta.read_text().splitlines()
+    ruta.write_text("\n".join([json.dumps({"clave": "otra"})] + lineas[1:]) + "\n")
+
+    motor = MotorFalso()
+    transcribir_con_checkpoint(tmp_path / "ck", motor, monkeypatch)
+    assert motor.llamadas == ventanas
+
+
+def test_reescritura_atomica_conserva_las_ventanas(tmp_path, audio, monkeypatch):
+    ruta = interrumpir(tmp_path / "ck", monkeypatch)
+    contenido_original = ruta.read_text()
+    en_disco = []
+
+    def leer_checkpoint():
+        en_disco.append((ruta.read_text(), sorted(p.name for p in ruta.parent.iterdir())))
+
+    # Al transcribir la primera ventana nueva, el checkpoint en disco ya debe tener las ventanas guardadas.
+    with pytest.raises(RuntimeError):
+        transcribir_con_checkpoint(tmp_path / "ck", MotorFalso(fallar_en=2, al_llamar=leer_checkpoint), monkeypatch)
+    texto, archivos = en_disco[0]
+    assert texto == contenido_original
+    assert not any(nombre.endswith(".tmp") for nombre in archivos)
+    assert ruta.read_text().startswith(contenido_original)
+
+
+def test_la_clave_depende_del_contenido_no_del_archivo(audio):
+    parametros = {"motor": "whisper", "model_size": "base"}
+    clave = motores_asr._clave_checkpoint(audio, parametros)
+    assert motores_asr._clave_checkpoint(audio.copy(), parametros) == clave
+
+    modificado = audio.copy()
+    modificado[100] += 0.5
+    assert motores_asr._clave_checkpoint(modificado, parametros) != clave
+    assert motores_asr._clave_checkpoint(audio, {**parametros, "model_size": "small"}) != clave
+
+
+def test_un_segundo_trabajo_con_el_mismo_checkpoint_se_rechaza(tmp_path):
+    ruta = str(tmp_path / "audio_abc.jsonl")
+    with motores_asr._bloquear_checkpoint(ruta):
+        with pytest.raises(motores_asr.CheckpointEnUso):
+            with motores_asr._bloquear_checkpoint(ruta):
+                pass
+    with motores_asr._bloquear_checkpoint(ruta):
+        pass
+    assert list(tmp_path.iterdir()) == []
+
+
+# --- Entrega de texto durante la transcripción ---
+
+class ModeloFasterWhisperFalso:
+    """Imita `WhisperModel.transcribe`: un segmento de 10 s por paso, generado de forma perezosa."""
+
+    def __init__(self, segmentos):
+        self.segmentos = segmentos
+        self.generados = 0
+
+    def transcribe(self, audio, **opciones):
+        def generar():
+            for i in range(self.segmentos):
+                self.generados += 1
+                yield SimpleNamespace(start=i * 10.0, end=(i + 1) * 10.0, text=f" s{i}", words=[])
+        return generar(), SimpleNamespace(duration=self.segmentos * 10.0, language="es")
+
+
+def test_faster_whisper_entrega_el_texto_por_grupos_mientras_transcribe(monkeypatch):
+    modelo = ModeloFasterWhisperFalso(segmentos=7)
+    monkeypatch.setattr(motores_asr, 'WhisperModel', object)
+    monkeypatch.setattr(motores_asr, '_cargar_faster_whisper', lambda *args: modelo)
+    entregas = []
+
+    resultado = motores_asr.transcribir(
+        np.zeros(SR, dtype=np.float32), motor='faster-whisper', model_size='base',
+        al_transcribir_texto=lambda texto: entregas.append((texto, modelo.generados))
+    )
+
+    assert [texto for texto, _ in entregas] == [" s0 s1 s2", " s3 s4 s5", " s6"]
+    assert entregas[0][1] < modelo.segmentos
+    assert "".join(texto for texto, _ in entregas) == resultado["text"]
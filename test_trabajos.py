@@ -0,0 +1,83 @@
+"""
+Pruebas de cancelación de trabajos con subprocesos falsos de larga duración.
+
+Uso:
+    python -m pytest -q test_trabajos.py
+"""
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from trabajos import (
+    OperacionCancelada,
+    TokenCancelacion,
+    TrabajoDuplicado,
+    cancelar_trabajo,
+    cancelar_trabajos_de_sesion,
+    ejecutar_comando,
+    trabajo,
+)
+
+# Proceso falso que tarda mucho más que cualquier plazo de las pruebas.
+DORMIR = [sys.executable, '-c', 'import time; time.sleep(30)']
+# Proceso que deja un hijo con las mismas tuberías abiertas, como yt-dlp al lanzar ffmpeg.
+DORMIR_CON_HIJO = ['sh', '-c', 'sleep 30 & sleep 30']
+
+
+def medir(funcion, *args, **kwargs):
+    inicio = time.monotonic()
+    with pytest.raises(OperacionCancelada) as error:
+        funcion(*args, **kwargs)
+    return time.monotonic() - inicio, str(error.value)
+
+
+def test_plazo_vencido_mata_el_proceso():
+    transcurrido, motivo = medir(ejecutar_comando, DORMIR, cancelacion=TokenCancelacion(plazo=1))
+    assert motivo == "plazo excedido"
+    assert transcurrido < 5
+
+
+def test_plazo_vencido_mata_tambien_a_los_hijos():
+    transcurrido, _ = medir(ejecutar_comando, DORMIR_CON_HIJO, cancelacion=TokenCancelacion(plazo=1))
+    assert transcurrido < 5
+
+
+def test_cancelar_trabajo_mata_el_proceso():
+    with trabajo("trabajo-de-prueba") as (trabajo_id, cancelacion):
+        threading.Timer(1, cancelar_trabajo, args=(trabajo_id,)).start()
+        transcurrido, motivo = medir(ejecutar_comando, DORMIR_CON_HIJO, cancelacion=cancelacion)
+    assert motivo == "cancelado por el usuario"
+    assert transcurrido < 5
+
+
+def test_cancelar_sesion_mata_el_proceso_de_una_etapa():
+    with trabajo(sesion="sesion-de-prueba") as (_, cancelacion):
+        threading.Timer(1, cancelar_trabajos_de_sesion, args=("sesion-de-prueba",)).start()
+        transcurrido, _ = medir(ejecutar_comando, DORMIR, cancelacion=cancelacion.con_plazo(60))
+    assert transcurrido < 5
+
+
+def test_sin_cancelar_devuelve_completed_process():
+    resultado = ejecutar_comando([sys.executable, '-c', 'print("hola")'], cancelacion=TokenCancelacion(plazo=60), text=True)
+    assert isinstance(resultado, subprocess.CompletedProcess)
+    assert resultado.returncode == 0
+    assert resultado.stdout.strip() == "hola"
+
+
+def test_codigo_de_salida_distinto_de_cero_lanza_error():
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        ejecutar_comando([sys.executable, '-c', 'import sys; sys.exit(3)'])
+    assert error.value.returncode == 3
+
+
+def test_id_en_uso_se_rechaza_y_conserva_el_trabajo_original():
+    with trabajo("repetido") as (_, cancelacion):
+        with pytest.raises(TrabajoDuplicado):
+            with trabajo("repetido"):
+                pass
+        assert cancelar_trabajo("repetido")
+        assert cancelacion.cancelado
+    assert not cancelar_trabajo("repetido")
@@ -0,0 +1,148 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# --- CONFIGURACIÓN ---
+INTERVALO_SONDEO_SEGUNDOS = 0.5
+
+# --- CANCELACIÓN ---
+
+class OperacionCancelada(Exception):
+    """Se lanza cuando un trabajo se cancela o su etapa supera el plazo."""
+
+
+class TrabajoDuplicado(Exception):
+    """Se lanza al registrar un trabajo con un id que ya está en curso."""
+
+
+class TokenCancelacion:
+    """
+    Señal de cancelación cooperativa. Las etapas largas llaman a `verificar()` entre pasos.
+    Un token hijo (`con_plazo`) se cancela con su padre o al vencer su propio plazo.
+    """
+
+    def __init__(self, plazo=None, padre=None):
+        self._evento = threading.Event()
+        self._padre = padre
+        self._limite = time.monotonic() + plazo if plazo else None
+        self._motivo = None
+
+    def cancelar(self, motivo="cancelado"):
+        self._motivo = motivo
+        self._evento.set()
+
+    @property
+    def motivo(self):
+        if self._evento.is_set():
+            return self._motivo
+        if self._padre and self._padre.cancelado:
+            return self._padre.motivo
+        if self._limite and time.monotonic() > self._limite:
+            return "plazo excedido"
+        return None
+
+    @property
+    def cancelado(self):
+        return self.motivo is not None
+
+    def verificar(self):
+        motivo = self.motivo
+        if motivo:
+            raise OperacionCancelada(motivo)
+
+    def con_plazo(self, plazo):
+        return TokenCancelacion(plazo=plazo, padre=self)
+
+
+def token_de_etapa(cancelacion, plazo):
+    """Token para una etapa con su propio plazo, ligado al token del trabajo si existe."""
+    return cancelacion.con_plazo(plazo) if cancelacion else TokenCancelacion(plazo=plazo)
+
+# --- PROCESOS EXTERNOS ---
+
+def iniciar_proceso(comando, **kwargs):
+    """`subprocess.Popen` en su propio grupo de procesos, para poder terminarlo junto con sus hijos."""
+    return subprocess.Popen(comando, start_new_session=True, **kwargs)
+
+def terminar_proceso(proceso):
+    """
+    Mata un proceso creado con `iniciar_proceso` y todos sus hijos (p. ej. el ffmpeg que lanza yt-dlp),
+    que de otro modo mantendrían abiertas las tuberías.
+    """
+    if not hasattr(os, 'killpg'):
+        proceso.kill()
+        return
+    try:
+        os.killpg(proceso.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def ejecutar_comando(comando, cancelacion=None, **kwargs):
+    """
+    Equivalente a `subprocess.run(comando, check=True, capture_output=True, ...)` que mata el proceso
+    y sus hijos si el token se cancela o vence su plazo, y entonces lanza `OperacionCancelada`.
+    """
+    with iniciar_proceso(comando, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs) as proceso:
+        while True:
+            try:
+                stdout, stderr = proceso.communicate(timeout=INTERVALO_SONDEO_SEGUNDOS)
+                break
+            except subprocess.TimeoutExpired:
+                if cancelacion and cancelacion.cancelado:
+                    terminar_proceso(proceso)
+                    proceso.communicate()
+                    print(f"WARNING: Proceso '{comando[0]}' terminado ({cancelacion.motivo}).")
+                    cancelacion.verificar()
+
+    if proceso.returncode:
+        raise subprocess.CalledProcessError(proceso.returncode, comando, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(comando, proceso.returncode, stdout, stderr)
+
+# --- REGISTRO DE TRABAJOS ---
+
+_trabajos = {}
+_trabajos_por_sesion = {}
+_candado = threading.Lock()
+
+@contextmanager
+def trabajo(trabajo_id=None, sesion=None):
+    """
+    Registra un trabajo cancelable mientras dura el bloque. Devuelve (trabajo_id, token).
+    Lanza `TrabajoDuplicado` si ya hay un trabajo en curso con el mismo `trabajo_id`.
+    """
+    trabajo_id = trabajo_id or uuid.uuid4().hex
+    cancelacion = TokenCancelacion()
+    with _candado:
+        if trabajo_id in _trabajos:
+            raise TrabajoDuplicado(f"Ya hay un trabajo en curso con id '{trabajo_id}'.")
+        _trabajos[trabajo_id] = cancelacion
+        if sesion:
+            _trabajos_por_sesion.setdefault(sesion, set()).add(trabajo_id)
+    try:
+        yield trabajo_id, cancelacion
+    finally:
+        with _candado:
+            _trabajos.pop(trabajo_id, None)
+            if sesion in _trabajos_por_sesion:
+                _trabajos_por_sesion[sesion].discard(trabajo_id)
+                if not _trabajos_por_sesion[sesion]:
+                    del _trabajos_por_sesion[sesion]
+
+def cancelar_trabajo(trabajo_id, motivo="cancelado por el usuario"):
+    """Cancela un trabajo en curso. Devuelve False si no existe o ya terminó."""
+    with _candado:
+        cancelacion = _trabajos.get(trabajo_id)
+    if not cancelacion:
+        return False
+    cancelacion.cancelar(motivo)
+    return True
+
+def cancelar_trabajos_de_sesion(sesion, motivo="cancelado por el usuario"):
+    """Cancela todos los trabajos en curso de una sesión de la interfaz. Devuelve cuántos se cancelaron."""
+    with _candado:
+        ids = list(_trabajos_por_sesion.get(sesion, ()))
+    return sum(cancelar_trabajo(trabajo_id, motivo) for trabajo_id in ids)